@@ -1,18 +1,54 @@
 from fastapi import FastAPI, Request, File, UploadFile, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import os
 import uvicorn
+import anyio
+import asyncio
+import base64
+import calendar
 import csv
+import json
+from collections import OrderedDict
+import contextlib
+import io
+import functools
+import itertools
+import math
+import shutil
+import tempfile
+import urllib.parse
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import uuid
+import queue
+import threading
+import time
 from datetime import datetime
 import glob
-from elasticsearch import Elasticsearch
+import hashlib
+from elasticsearch import Elasticsearch, AsyncElasticsearch, NotFoundError, helpers
+from elasticsearch.exceptions import SerializationError
+from elasticsearch.serializer import JSONSerializer
+from json.encoder import encode_basestring
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import re
 from typing import Optional
 
+try:
+    import orjson  # Необязательный быстрый JSON кодировщик для _bulk запросов
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa  # Необязательно: промежуточные файлы в формате Parquet
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 app = FastAPI()
 
 # Конфигурация
@@ -25,263 +61,1197 @@ MERGED = 'input.csv'
 RESULT = 'result.csv'
 DELETED = 'deleted.csv'
 
+# Формат промежуточных файлов input, result и deleted: "csv" или "parquet".
+# Parquet хранит колонки без разбора текста при повторном чтении и в несколько раз меньше на диске
+STAGING_FORMAT = "csv"
+PARQUET_COMPRESSION = "zstd"
+if STAGING_FORMAT == "parquet" and pq is None:
+    print("pyarrow не установлен, промежуточные файлы сохраняются в CSV")
+    STAGING_FORMAT = "csv"
+
+# Параметры пакетной загрузки в Elasticsearch
+BULK_BATCH_SIZE = 500  # Количество документов в одном _bulk запросе
+BULK_MAX_BYTES = 10 * 1024 * 1024  # Максимальный размер _bulk запроса в байтах
+BULK_MAX_REPORTED_ERRORS = 20  # Сколько ошибок по документам выводить в лог
+BULK_MAX_FAILED_DOCS = 0  # Сколько отклоненных документов допустимо, чтобы загрузка считалась успешной
+BULK_WORKERS = 4  # Количество параллельных потоков загрузки (1 - последовательная загрузка)
+BULK_QUEUE_SIZE = 8  # Максимальное число пакетов в очереди между чтением CSV и потоками
+BULK_MAX_RETRIES = 5  # Повторы при 429 / отказе очереди записи Elasticsearch
+BULK_INITIAL_BACKOFF = 2  # Начальная задержка перед повтором в секундах (удваивается)
+BULK_MAX_BACKOFF = 60  # Максимальная задержка перед повтором в секундах
+
+# Параметры объединения CSV файлов
+MERGE_CHUNK_SIZE = 50_000  # Количество строк, читаемых из файла за один раз
+MERGE_STREAM_TO_ES = False  # Загружать объединенные строки сразу в input_db без записи input.csv
+
+# Фоновые задачи: обработчики ставят работу в очередь и сразу возвращают id задачи.
+# Задачи выполняются по одной в порядке постановки: они используют общие input.csv, контрольные точки
+# и поколения индексов (index_builds, номер input_db_vN), поэтому параллельный запуск приводит к гонкам
+JOB_WORKERS = 1
+JOB_HISTORY_LIMIT = 100  # Сколько завершенных задач хранить для /jobs/{id}
+
+# Загрузка файлов частями и контрольные точки импорта
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Размер части при записи загружаемого файла на диск
+IMPORT_CHECKPOINTS = True  # Сохранять позицию импорта CSV для продолжения после сбоя
+IMPORT_CHECKPOINT_ROWS = 50_000  # Через сколько строк фиксировать контрольную точку
+CHECKPOINT_DIR = "checkpoints"  # Папка контрольных точек внутри CSV_FOLDER
+
+# Однопроходный конвейер: объединение -> валидация -> загрузка во все индексы
+PIPELINE_WRITE_CSV = False  # Сохранять промежуточные input.csv, result.csv и deleted.csv
 
-# Регулярные выражения для валидации
-status_pattern = r'(В эксплуатации|Планируется|Подготовка к эксплуатации|Выведен из эксплуатации|На обслуживании)?'
-ci_code_pattern = r'[A-Za-z]{3}[ -]\d{8}'
-hostname_pattern = r'$|^[A-Za-z]{3}\d-[A-Za-z]{3}-[A-Za-z]{3}'
-dns_pattern = r'$|^[A-Za-z]{3}\d-[A-Za-z]{3}-[A-Za-z]{3}\.[A-Za-z]*\.[A-Za-z]*'
-short_name_pattern = r'^.*$'
-created_on_pattern = r'$|^.*'
-updated_on_pattern = r'$|^.*'
-name_pattern = r'[^|]*\|[^|]*'
-id_pattren = r'[A-Za-z0-9]{8}-[A-Za-z0-9]{4}-[A-Za-z0-9]{4}-[A-Za-z0-9]{4}-[A-Za-z0-9]{12}'
-type_pattern = r'^.*$'
-serial_pattern = r'$|^[A-Za-z]*'
-full_name_pattern = r'$|^.*'
-description_pattern = r'$|^.*'
-notes_pattern = r'$|^.*'
-manufacturer_pattern = r'$|^.*'
-model_pattern = r'$|^.*'
-location_pattern = r'$|^.*'
-ip_pattern = r'$|^((25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)'
-cpu_cores_pattern = r'$|^\d+'
-cpu_freq_pattern = r'$|^-?\d+\.\d+'
-ram_pattern = r'^$|^\d+'
-total_volume_pattern = r'^$|^\d+$'
-category_pattern = r'^$|^\d+$'
-user_org_pattern = r'^$|^.*$'
-owner_org_pattern = r'^$|^.*$'
-code_mon_pattern = r'^$|^.*$'
-mount_pattern = r'^$|^(?:[Сс]тойка|[Мм]есто)\s*\d+$'
-
-# Константы для имен полей
-STATUS = 'status'
+# Инкрементальная загрузка: документы result_db получают постоянный _id, неизмененные строки пропускаются
+# по хэшу содержимого, измененные перезаписываются. input_db хранит все строки с дубликатами
+# и всегда пересобирается полностью
+IMPORT_INCREMENTAL = False  # Загружать только изменения вместо пересоздания индекса
+INCREMENTAL_DELETE_MISSING = False  # Удалять документы, которых нет в новой загрузке
+
+
+# Схема данных: порядок полей берется из db/fields.csv, а типы полей, веса для выбора
+# лучшей строки среди дубликатов и правила валидации - из db/rules.json.
+# По схеме строятся маппинги индексов, преобразование строки в документ и валидатор
+SCHEMA_FIELDS_FILE = os.path.join(CSV_FOLDER, 'fields.csv')
+SCHEMA_RULES_FILE = os.path.join(CSV_FOLDER, 'rules.json')
+
+def load_schema(fields_file: str = SCHEMA_FIELDS_FILE, rules_file: str = SCHEMA_RULES_FILE) -> dict:
+    """Загружает схему данных один раз при запуске"""
+    with open(fields_file, 'r', encoding='utf-8', newline='') as f:
+        fields = next(csv.reader(f))
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+
+    missing = [field for field in fields if field not in rules["fields"]]
+    if missing:
+        raise ValueError(f"В {rules_file} нет описания полей: {', '.join(missing)}")
+
+    return {
+        "fields": fields,
+        "types": {field: rules["fields"][field]["type"] for field in fields},
+        "weights": {field: rules["fields"][field]["weight"] for field in fields},
+        "rules": [(rule["field"], rule["pattern"], rule["message"]) for rule in rules["rules"]]
+    }
+
+SCHEMA = load_schema()
+
+# Строки данных внутри конвейера - кортежи значений в порядке полей схемы, а не словари:
+# позиция каждого поля известна заранее, и ключи не хэшируются на каждой строке
+ROW_FIELDS = SCHEMA["fields"]
+FIELD_POSITION = {field: i for i, field in enumerate(ROW_FIELDS)}
+
+# Константы для имен полей ключа дубликатов; остальные поля берутся из схемы
 CI_CODE = 'ci_code'
 HOSTNAME = 'hostname'
 DNS = 'dns'
-SHORT_NAME = 'short_name'
-CREATED_ON = 'created_on'
-UPDATED_ON = 'updated_on'
-NAME = 'name'
 ID = 'id'
-TYPE = 'type'
-SERIAL = 'serial'
-FULL_NAME = 'full_name'
-DESCRIPTION = 'description'
-NOTES = 'notes'
-MANUFACTURER = 'manufacturer'
-MODEL = 'model'
-LOCATION = 'location'
-IP = 'ip'
-CPU_CORES = 'cpu_cores'
-CPU_FREQ = 'cpu_freq'
-RAM = 'ram'
-TOTAL_VOLUME = 'total_volume'
-CATEGORY = 'category'
-USER_ORG = 'user_org'
-OWNER_ORG = 'owner_org'
-CODE_MON = 'code_mon'
-MOUNT = 'mount'
+
+# Правила валидации: поле, регулярное выражение, сообщение об ошибке.
+# Порядок правил задает номер бита в битовой маске ошибок.
+VALIDATION_RULES = SCHEMA["rules"]
+
+# Регулярные выражения компилируются один раз при запуске
+COMPILED_RULES = [(field, re.compile(pattern), message) for field, pattern, message in VALIDATION_RULES]
+ROW_RULES = [(FIELD_POSITION[field], regex, message) for field, regex, message in COMPILED_RULES]
+
+# Размер блока строк при поколоночной валидации
+VALIDATION_CHUNK_SIZE = 100_000
+VALIDATION_COLUMNAR = True  # Валидировать целыми колонками pandas вместо построчной проверки
+VALIDATION_WORKERS = os.cpu_count() or 1  # Количество процессов валидации (1 - без пула процессов)
+VALIDATION_SHARD_SIZE = 64 * 1024 * 1024  # Максимальный размер одного фрагмента input.csv в байтах
+
+# Веса полей для выбора лучшей строки среди дубликатов
+q = SCHEMA["weights"]
+
+# Поля, по которым строки считаются дубликатами
+UNIQUE_CODES = [
+    CI_CODE,
+    DNS,
+    HOSTNAME,
+    ID
+]
+
+# Поля постоянного идентификатора документа result_db при инкрементальной загрузке.
+# Совпадают с ключом дедупликации, поэтому у каждой лучшей строки свой _id
+INCREMENTAL_KEY_FIELDS = UNIQUE_CODES
+INCREMENTAL_KEY_POSITIONS = [FIELD_POSITION[field] for field in INCREMENTAL_KEY_FIELDS]
+INCREMENTAL_INDEX = "result_db"
+
+# Веса q в порядке колонок матрицы пустых полей для поколоночной оценки
+REWARD_FIELDS = list(q)
+REWARD_WEIGHTS = np.array([q[field] for field in REWARD_FIELDS], dtype=np.int64)
+REWARD_POSITIONS = [(FIELD_POSITION[field], weight) for field, weight in q.items()]
+UNIQUE_POSITIONS = [FIELD_POSITION[field] for field in UNIQUE_CODES]
+
+DEDUP_ENABLED = True  # Удалять дубликаты среди валидных строк
+DUPLICATE_REASON = "Дубликат записи по ключу ci_code, dns, hostname, id"
+
+# Дедупликация вне памяти: строки разбиваются по хэшу ключа на файлы на диске,
+# и каждый файл обрабатывается отдельным процессом
+DEDUP_EXTERNAL = False  # Использовать дедупликацию через файлы разделов
+DEDUP_MEMORY_LIMIT = 1024 * 1024 * 1024  # Примерный предел памяти на все процессы дедупликации в байтах
+DEDUP_MEMORY_FACTOR = 6  # Во сколько раз строки в памяти занимают больше, чем в CSV
+DEDUP_WORKERS = os.cpu_count() or 1  # Количество процессов дедупликации
+
+# Приведение типов при загрузке в Elasticsearch
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"  # Формат дат в CSV
+DATE_CACHE_SIZE = 65536  # Сколько различных строк дат запоминать (одинаковые метки времени повторяются)
+CONVERT_COLUMNAR = True  # Приводить числа и даты целыми колонками pandas в блоках импорта
+
+# Кодирование дат, Decimal и типов numpy как в клиенте Elasticsearch
+json_default = JSONSerializer().default
+
+def dumps_json(data) -> str:
+    """Компактный JSON для тела _bulk запроса: orjson, если установлен, иначе стандартный json"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=json_default).decode('utf-8')
+        except TypeError:
+            pass  # orjson не кодирует, например, целые длиннее 64 бит
+    return json.dumps(data, default=json_default, ensure_ascii=False, separators=(',', ':'))
+
+class BulkJSONSerializer(JSONSerializer):
+    """Сериализатор клиента Elasticsearch через dumps_json; готовые строки JSON передаются как есть"""
+
+    def dumps(self, data):
+        if isinstance(data, str):
+            return data
+        try:
+            return dumps_json(data)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(data, e)
 
 # Инициализация Elasticsearch с таймаутами
-es = Elasticsearch([ELASTICSEARCH_HOST])
+es = Elasticsearch([ELASTICSEARCH_HOST], serializer=BulkJSONSerializer())
+
+# Пересоздание индексов без простоя: данные загружаются в новое поколение индекса (input_db_v3),
+# а пользователи читают через алиас (input_db), который переключается после успешной загрузки
+INDEX_KEEP_GENERATIONS = 1  # Сколько предыдущих поколений хранить после переключения алиаса
+INDEX_REPLICAS = 1  # Количество реплик после загрузки
+INDEX_LOAD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}  # Настройки на время загрузки
+index_builds = {}  # Алиас -> индекс, который сейчас загружается
+
+# Асинхронный клиент для страниц просмотра создается при запуске приложения
+ES_POOL_MAXSIZE = 25  # Максимальное число одновременных соединений с Elasticsearch для поиска
+ES_SEARCH_TIMEOUT = 10  # Таймаут поискового запроса в секундах
+ES_MAX_RETRIES = 2  # Повторы поискового запроса при таймауте или обрыве соединения
+es_async: Optional[AsyncElasticsearch] = None
+es_async_loop: Optional[asyncio.AbstractEventLoop] = None  # Цикл событий, в котором работает es_async
+
+# Глубокая пагинация через point-in-time и search_after
+SEARCH_PIT_KEEP_ALIVE = "10m"  # Время жизни point-in-time между запросами страниц
+SEARCH_CURSOR_CACHE_SIZE = 10_000  # Сколько курсоров страниц хранить для переходов на произвольную страницу
+SEARCH_MAX_WINDOW = 10_000  # Максимум документов за один шаг при переходе к дальней странице
+
+# Кэш результатов поиска для страниц просмотра
+SEARCH_CACHE_ENABLED = True  # Кэшировать ответы поиска
+SEARCH_CACHE_TTL = 60  # Время жизни ответа в кэше в секундах
+SEARCH_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Примерный предел памяти кэша в байтах
+search_cache = OrderedDict()  # (индекс, поколение, запрос, страница, размер) -> ответ
+search_cache_lock = threading.Lock()
+search_cache_bytes = 0
+search_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+index_generations = {}  # Индекс -> номер пересоздания, меняется при пересоздании индекса
+
+# Поля, которые выводит таблица просмотра: keyword-поля читаются из doc values,
+# остальные - из отфильтрованного _source. Полный документ загружается только для карточки записи
+LISTING_SOURCE_FIELDS = ["id", "name", "short_name", "full_name", "ip"]
+LISTING_DOCVALUE_FIELDS = [
+    "ci_code", "manufacturer", "serial", "location", "mount", "hostname",
+    "dns", "type", "category", "user_org", "code_mon"
+]
+VIEW_INDICES = {"original": ELASTICSEARCH_INDEX, "result": "result_db", "delete": "deleted_db"}
+SEARCH_FIELDS = [
+    "name", "ci_code", "short_name", "full_name", "description", "notes",
+    "manufacturer", "serial", "model", "location", "mount", "hostname",
+    "dns", "type", "category", "user_org", "owner_org", "code_mon"
+]  # Поля полнотекстового поиска
+search_timings = {}  # Индекс -> количество поисков и суммарное время
+
+# Фасетный поиск по keyword-полям: фильтры идут в filter-контекст (без подсчета релевантности
+# и с кэшем фильтров Elasticsearch), а количество по значениям приходит в том же запросе
+FACET_FIELDS = ["status", "manufacturer", "location", "type", "category", "user_org", "owner_org", "code_mon"]
+FACET_SIZE = 10  # Сколько значений каждого поля показывать
+
+# Выгрузка индексов в CSV/NDJSON потоком через point-in-time
+EXPORT_BATCH_SIZE = 1000  # Документов за один запрос к Elasticsearch
+EXPORT_FIELDS = SCHEMA["fields"]  # Колонки CSV в порядке полей схемы
 
 app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
 templates = Jinja2Templates(directory="frontend/templates")
 
+@app.on_event("startup")
+async def open_async_elasticsearch():
+    """Создает общий асинхронный клиент с пулом соединений"""
+    global es_async, es_async_loop
+    es_async_loop = asyncio.get_running_loop()
+    es_async = AsyncElasticsearch(
+        [ELASTICSEARCH_HOST],
+        maxsize=ES_POOL_MAXSIZE,
+        timeout=ES_SEARCH_TIMEOUT,
+        max_retries=ES_MAX_RETRIES,
+        retry_on_timeout=True
+    )
+
+@app.on_event("shutdown")
+async def close_async_elasticsearch():
+    """Закрывает соединения асинхронного клиента"""
+    if es_async is not None:
+        await es_async.close()
+
+async def close_search_pit(pit_id: str):
+    """Закрывает point-in-time; истекший или уже закрытый пропускается"""
+    try:
+        await es_async.close_point_in_time(body={"id": pit_id})
+    except Exception as e:
+        print(f"Не удалось закрыть point-in-time: {str(e)}")
+
+def invalidate_search_cache(index_name: str):
+    """Сбрасывает кэш поиска и point-in-time индекса после его пересоздания"""
+    global search_cache_bytes
+    with search_cache_lock:
+        index_generations[index_name] = index_generations.get(index_name, 0) + 1
+        for key in [key for key in search_cache if key[0] == index_name]:
+            search_cache_bytes -= search_cache.pop(key)[1]
+        search_cache_stats["invalidations"] += 1
+    state = search_pits.pop(index_name, None)
+    if state is not None and es_async_loop is not None:
+        # Вызывается из потоков фоновых задач: закрытие выполняется в цикле событий асинхронного клиента,
+        # иначе point-in-time держит сегменты старого поколения до истечения SEARCH_PIT_KEEP_ALIVE
+        asyncio.run_coroutine_threadsafe(close_search_pit(state["id"]), es_async_loop)
+
+def get_cached_search(key: tuple):
+    """Возвращает ответ из кэша поиска или None"""
+    global search_cache_bytes
+    with search_cache_lock:
+        entry = search_cache.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            search_cache_bytes -= search_cache.pop(key)[1]
+            entry = None
+        if entry is None:
+            search_cache_stats["misses"] += 1
+            return None
+        search_cache.move_to_end(key)
+        search_cache_stats["hits"] += 1
+        return entry[2]
+
+def put_cached_search(key: tuple, value: tuple):
+    """Сохраняет ответ в кэше поиска, вытесняя самые старые записи при превышении лимита памяти"""
+    global search_cache_bytes
+    size = len(json.dumps(value, default=str))
+    if size > SEARCH_CACHE_MAX_BYTES:
+        return
+    with search_cache_lock:
+        if key[1] != index_generations.get(key[0], 0):
+            return  # Индекс пересоздан, пока выполнялся запрос
+        if key in search_cache:
+            search_cache_bytes -= search_cache.pop(key)[1]
+        search_cache[key] = (time.monotonic() + SEARCH_CACHE_TTL, size, value)
+        search_cache_bytes += size
+        while search_cache_bytes > SEARCH_CACHE_MAX_BYTES:
+            search_cache_bytes -= search_cache.popitem(last=False)[1][1]
+            search_cache_stats["evictions"] += 1
+
+# Служебные поля индексов в дополнение к полям схемы
+CONTENT_HASH_PROPERTY = {"content_hash": {"type": "keyword", "index": False}}  # Хэш содержимого для инкрементальной загрузки
+VALIDATION_ERRORS_PROPERTY = {"validation_errors": {"type": "text"}}  # Дополнительное поле для ошибок валидации
+
+def build_mapping(extra_properties: dict = None) -> dict:
+    """Маппинг индекса по схеме данных"""
+    properties = {field: {"type": field_type} for field, field_type in SCHEMA["types"].items()}
+    properties.update(extra_properties or {})
+    return {"mappings": {"properties": properties}}
+
+def get_index_generations(alias: str) -> list:
+    """Возвращает существующие поколения индекса, от старых к новым"""
+    names = es.indices.get(index=f"{alias}_v*", allow_no_indices=True, ignore_unavailable=True)
+    generations = []
+    for name in names:
+        suffix = name[len(alias) + 2:]
+        if suffix.isdigit():
+            generations.append((int(suffix), name))
+    return [name for _, name in sorted(generations)]
+
+def begin_index_build(alias: str, mapping: dict) -> str:
+    """Создает следующее поколение индекса с настройками для быстрой загрузки"""
+    # Новая загрузка заменяет прерванную: ее поколение больше не нужно
+    if os.path.exists(get_checkpoint_path(alias)):
+        with open(get_checkpoint_path(alias), 'r', encoding='utf-8') as f:
+            es.indices.delete(index=json.load(f)["index"], ignore_unavailable=True)
+        remove_checkpoint(alias)
+
+    generations = get_index_generations(alias)
+    version = int(generations[-1][len(alias) + 2:]) + 1 if generations else 1
+    index_name = f"{alias}_v{version}"
+
+    body = dict(mapping, settings={"index": INDEX_LOAD_SETTINGS})
+    es.indices.create(index=index_name, body=body)
+    index_builds[alias] = index_name
+    print(f"Создан индекс {index_name} для загрузки {alias}")
+    return index_name
+
+def resolve_index(index_name: str) -> str:
+    """Заменяет алиасы, которые сейчас загружаются, на индексы новых поколений"""
+    return ",".join(index_builds.get(name, name) for name in index_name.split(","))
+
+def publish_index_build(alias: str):
+    """Возвращает обычные настройки загруженному поколению и атомарно переключает на него алиас"""
+    index_name = index_builds.pop(alias)
+    es.indices.put_settings(
+        index=index_name,
+        body={"index": {"refresh_interval": None, "number_of_replicas": INDEX_REPLICAS}}
+    )
+    es.indices.refresh(index=index_name)
+
+    actions = [{"add": {"index": index_name, "alias": alias}}]
+    if es.indices.exists_alias(name=alias):
+        for name in es.indices.get_alias(name=alias):
+            actions.insert(0, {"remove": {"index": name, "alias": alias}})
+    elif es.indices.exists(index=alias):
+        # Индекс старого формата с именем алиаса удаляется в том же атомарном запросе
+        actions.insert(0, {"remove_index": {"index": alias}})
+    es.indices.update_aliases(body={"actions": actions})
+    invalidate_search_cache(alias)
+    remove_checkpoint(alias)
+    print(f"Алиас {alias} переключен на {index_name}")
+
+    # Удаляем старые поколения
+    old_generations = [name for name in get_index_generations(alias) if name != index_name]
+    for name in old_generations[:max(len(old_generations) - INDEX_KEEP_GENERATIONS, 0)]:
+        es.indices.delete(index=name, ignore_unavailable=True)
+        print(f"Удален старый индекс {name}")
+
+def discard_index_build(alias: str):
+    """Удаляет незавершенное поколение индекса; алиас продолжает указывать на прежние данные.
+    Если у загрузки есть контрольная точка, поколение сохраняется для /resume_import"""
+    index_name = index_builds.pop(alias, None)
+    if os.path.exists(get_checkpoint_path(alias)):
+        print(f"Загрузка {alias} прервана, ее можно продолжить с контрольной точки")
+        return
+    if index_name is not None:
+        es.indices.delete(index=index_name, ignore_unavailable=True)
+        print(f"Загрузка {alias} не завершена, индекс {index_name} удален")
+
 def create_elastic_index():
-    """Создает индекс в Elasticsearch с нужной структурой"""
-    if es.indices.exists(index=ELASTICSEARCH_INDEX):
-        es.indices.delete(index=ELASTICSEARCH_INDEX)
-    
-    mapping = {
-        "mappings": {
-            "properties": {
-                "id": {"type": "integer"},
-                "created_on": {"type": "date"},
-                "updated_on": {"type": "date"},
-                "name": {"type": "text"},
-                "ci_code": {"type": "keyword"},
-                "short_name": {"type": "text"},
-                "full_name": {"type": "text"},
-                "description": {"type": "text"},
-                "notes": {"type": "text"},
-                "status": {"type": "keyword"},
-                "manufacturer": {"type": "keyword"},
-                "serial": {"type": "keyword"},
-                "model": {"type": "keyword"},
-                "location": {"type": "keyword"},
-                "mount": {"type": "keyword"},
-                "hostname": {"type": "keyword"},
-                "dns": {"type": "keyword"},
-                "ip": {"type": "ip"},
-                "cpu_cores": {"type": "integer"},
-                "cpu_freq": {"type": "float"},
-                "ram": {"type": "integer"},
-                "total_volume": {"type": "integer"},
-                "type": {"type": "keyword"},
-                "category": {"type": "keyword"},
-                "user_org": {"type": "keyword"},
-                "owner_org": {"type": "keyword"},
-                "code_mon": {"type": "keyword"}
-            }
-        }
-    }
-    es.indices.create(index=ELASTICSEARCH_INDEX, body=mapping)
+    """Создает новое поколение индекса input_db в Elasticsearch с нужной структурой"""
+    return begin_index_build(ELASTICSEARCH_INDEX, build_mapping())
 
+# Строки, которые разбираются без исключений; остальные значения считаются пустыми
+INT_PATTERN = re.compile(r"\s*[+-]?[0-9]+\s*")
+INT_COLUMN_MAX_LENGTH = 15  # Целые до 15 знаков точно представимы во float64
+FLOAT_PATTERN = re.compile(r"\s*[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?\s*")
+DATE_PATTERN = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}")
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
 def parse_date(date_str):
-    """Преобразует строку даты в объект datetime"""
+    """Преобразует строку даты из CSV в строку ISO 8601 (2024-01-31T10:00:00),
+    которую Elasticsearch принимает как есть. Повторяющиеся даты берутся из кэша"""
+    if not isinstance(date_str, str) or not date_str:
+        return None
+    if DATE_PATTERN.fullmatch(date_str):
+        # Формат фиксированный, поэтому части даты берутся срезами
+        year, month, day = int(date_str[:4]), int(date_str[5:7]), int(date_str[8:10])
+        if (year >= 1 and 1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]
+                and int(date_str[11:13]) < 24 and int(date_str[14:16]) < 60 and int(date_str[17:19]) < 60):
+            return f"{date_str[:10]}T{date_str[11:]}"
+        return None
+    # Редкие записи без ведущих нулей (2024-1-5 9:00:00) разбирает strptime
     try:
-        return datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-    except:
+        return datetime.strptime(date_str, DATE_FORMAT).isoformat()
+    except (ValueError, TypeError):
         return None
 
 def safe_int_conversion(value):
     """Безопасное преобразование в целое число"""
-    try:
-        return int(value) if value else None
-    except (ValueError, TypeError):
-        return None
+    if isinstance(value, str) and INT_PATTERN.fullmatch(value):
+        return int(value)
+    return None
 
 def safe_float_conversion(value):
     """Безопасное преобразование в число с плавающей точкой"""
+    if isinstance(value, str) and FLOAT_PATTERN.fullmatch(value):
+        number = float(value)
+        return number if math.isfinite(number) else None  # 1e400 не помещается в float Elasticsearch
+    return None
+
+def as_python_strings(column: pd.Series) -> pd.Series:
+    """Колонка строк с типом object: методы .str работают через re и str Python, как построчная обработка.
+    У строкового типа pandas на pyarrow свой движок регулярных выражений, где \\d и \\s только ASCII"""
+    return column.astype(object)
+
+def convert_int_column(column: pd.Series) -> list:
+    """Поколоночный вариант safe_int_conversion.
+    Числа длиннее INT_COLUMN_MAX_LENGTH знаков разбираются построчно: pandas переводит колонку
+    с пропусками во float64, где они теряют точность или не помещаются в int64"""
+    matched = column.where(column.str.fullmatch(INT_PATTERN.pattern) == True).str.strip()
+    long_numbers = (matched.str.len().fillna(0) > INT_COLUMN_MAX_LENGTH).to_numpy(dtype=bool)
+    numbers = pd.to_numeric(matched.where(~long_numbers), errors='coerce').astype("Int64")
+    values = numbers.astype(object).where(numbers.notna(), None).tolist()
+    for i in np.flatnonzero(long_numbers).tolist():
+        values[i] = safe_int_conversion(matched.iloc[i])
+    return values
+
+def convert_float_column(column: pd.Series) -> list:
+    """Поколоночный вариант safe_float_conversion.
+    Строки уже проверены FLOAT_PATTERN, поэтому приводятся через astype: в отличие от to_numeric
+    оно округляет длинные числа и числа с порядком так же, как float()"""
+    numbers = column.where(column.str.fullmatch(FLOAT_PATTERN.pattern) == True).str.strip().astype('float64')
+    return numbers.astype(object).where(np.isfinite(numbers), None).tolist()
+
+def convert_date_column(column: pd.Series) -> list:
+    """Поколоночный вариант parse_date; записи не в формате DATE_FORMAT разбираются построчно"""
+    dates = pd.to_datetime(column, format=DATE_FORMAT, errors='coerce')
+    # Корректные даты в точном формате переводятся в ISO 8601 заменой пробела на T
+    regular = (dates.notna() & (dates.dt.year >= 1) & (column.str.slice(17, 19) < "60")
+               & (column.str.fullmatch(DATE_PATTERN.pattern) == True))
+    values = column.str.slice_replace(10, 11, "T")
+    return [value if ok else parse_date(raw)
+            for value, ok, raw in zip(values.tolist(), regular.tolist(), column.tolist())]
+
+# Преобразование значений по типу поля схемы; строковые поля только очищаются от пробелов
+TYPE_CONVERTERS = {
+    "integer": safe_int_conversion,
+    "float": safe_float_conversion,
+    "date": parse_date
+}
+COLUMN_CONVERTERS = {
+    "integer": convert_int_column,
+    "float": convert_float_column,
+    "date": convert_date_column
+}
+TYPED_FIELDS = [(field, field_type) for field, field_type in SCHEMA["types"].items() if field_type in TYPE_CONVERTERS]
+TYPED_POSITION = {field: i for i, (field, _) in enumerate(TYPED_FIELDS)}
+DOCUMENT_FIELDS = [
+    (field, FIELD_POSITION[field], TYPE_CONVERTERS.get(field_type), TYPED_POSITION.get(field))
+    for field, field_type in SCHEMA["types"].items()
+]
+
+def convert_typed_columns(chunk: pd.DataFrame) -> list:
+    """Приводит числовые поля и даты блока целыми колонками.
+    Возвращает для каждой строки кортеж значений в порядке TYPED_FIELDS для row_to_document"""
+    columns = [COLUMN_CONVERTERS[field_type](as_python_strings(chunk[field])) for field, field_type in TYPED_FIELDS]
+    return list(zip(*columns))
+
+def make_row_converter(file_headers: list):
+    """Возвращает функцию, которая приводит значения строки CSV к кортежу в порядке полей схемы.
+    Отсутствующие в файле поля и недостающие значения становятся пустыми строками"""
+    if list(file_headers) == ROW_FIELDS:
+        width = len(ROW_FIELDS)
+
+        def convert(values):
+            if len(values) != width:
+                values = (list(values) + [''] * width)[:width]
+            return tuple(values)
+        return convert
+
+    file_positions = {field: i for i, field in enumerate(file_headers)}
+    source = [file_positions.get(field) for field in ROW_FIELDS]
+
+    def convert(values):
+        size = len(values)
+        return tuple(values[i] if i is not None and i < size else '' for i in source)
+    return convert
+
+def iter_csv_rows(csvfile):
+    """Читает открытый CSV файл с заголовком и отдает строки кортежами в порядке полей схемы"""
+    reader = csv.reader(csvfile)
+    convert = make_row_converter(next(reader, ROW_FIELDS))
+    for values in reader:
+        yield convert(values)
+
+def row_to_document(row: tuple, index_name: str, typed: tuple = None) -> dict:
+    """Преобразует строку CSV в документ Elasticsearch.
+    typed - уже приведенные значения из convert_typed_columns"""
+    doc = {}
+    for field, position, convert, typed_position in DOCUMENT_FIELDS:
+        value = row[position]
+        if convert is not None:
+            value = convert(value) if typed is None else typed[typed_position]
+        elif value:
+            value = value.strip()
+        if value not in (None, ""):
+            doc[field] = value
+
+    # Для невалидных записей добавляем информацию об ошибках валидации
+    if index_name == "deleted_db":
+        # Валидная строка попадает в deleted.csv только как дубликат
+        doc["validation_errors"] = get_validation_errors(row) or DUPLICATE_REASON
+
+    return doc
+
+# Готовые ключи JSON документа: "name": и т.д.
+SOURCE_FIELDS = [
+    (encode_basestring(field) + ':', position, convert, typed_position)
+    for field, position, convert, typed_position in DOCUMENT_FIELDS
+]
+SOURCE_ERRORS_KEY = encode_basestring("validation_errors") + ':'
+SOURCE_HASH_KEY = encode_basestring("content_hash") + ':'
+
+def row_to_source(row: tuple, index_name: str, typed: tuple = None):
+    """То же, что row_to_document, но без промежуточного словаря: сразу собирает JSON документа.
+    Возвращает (id документа, JSON) или (None, None) для пустой строки.
+    Если uses_stable_ids(index_name), id берется из document_id, а в документ добавляется content_hash"""
+    parts = []
+    for key, position, convert, typed_position in SOURCE_FIELDS:
+        value = row[position]
+        if convert is not None:
+            value = convert(value) if typed is None else typed[typed_position]
+            if value is None:
+                continue
+            # Даты уже строки ISO 8601, числа конечны и кодируются через repr
+            parts.append(key + (encode_basestring(value) if isinstance(value, str) else repr(value)))
+        elif value:
+            value = value.strip()
+            if value:
+                parts.append(key + encode_basestring(value))
+
+    if index_name == "deleted_db":
+        parts.append(SOURCE_ERRORS_KEY + encode_basestring(get_validation_errors(row) or DUPLICATE_REASON))
+    if not parts:
+        return None, None
+    source = '{' + ','.join(parts) + '}'
+    if not uses_stable_ids(index_name):
+        return None, source
+    # Тот же хэш, что content_hash для словаря документа: JSON совпадает побайтно
+    digest = hashlib.sha1(source.encode('utf-8')).hexdigest()
+    return document_id(row), source[:-1] + ',' + SOURCE_HASH_KEY + '"' + digest + '"}'
+
+def make_bulk_action(doc: dict, index_name: str, doc_id: str = None) -> dict:
+    """Формирует действие индексации документа для _bulk запроса"""
+    action = {"_index": resolve_index(index_name), "_source": doc}
+    if doc_id is not None:
+        action["_id"] = doc_id  # Постоянный идентификатор из document_id
+    return action
+
+def make_source_action(doc_id, source: str, index_name: str) -> dict:
+    """Действие _bulk для документа, уже собранного в JSON функцией row_to_source"""
+    action = {"_index": resolve_index(index_name), "_source": source}
+    if doc_id is not None:
+        action["_id"] = doc_id
+    return action
+
+def generate_bulk_actions(rows, index_name: str, stats: dict):
+    """Генерирует действия для _bulk запроса из строк CSV"""
+    for i, row in enumerate(rows, 1):
+        stats["rows"] = i
+        try:
+            doc_id, source = row_to_source(row, index_name)
+        except Exception as doc_error:
+            print(f"Ошибка в строке {i}: {doc_error}")
+            continue
+
+        if source is None:
+            continue
+
+        yield make_source_action(doc_id, source, index_name)
+
+def record_bulk_result(stats: dict, ok: bool, item: dict):
+    """Учитывает результат индексации одного документа в статистике"""
+    if ok and "delete" in item:
+        stats["deleted"] += 1
+    elif ok:
+        stats["indexed"] += 1
+    else:
+        stats["failed"] += 1
+        info = next(iter(item.values()), None) if item else None
+        status = info.get("status") if isinstance(info, dict) else None
+        if not isinstance(status, int) or status == 429 or status >= 500:
+            stats["unavailable"] += 1  # Сбой Elasticsearch, а не ошибка в самом документе
+        if len(stats["errors"]) < BULK_MAX_REPORTED_ERRORS:
+            stats["errors"].append(item)
+
+def send_bulk(actions, batch_size: int = BULK_BATCH_SIZE, max_bytes: int = BULK_MAX_BYTES):
+    """Отправляет действия через _bulk с повтором при 429 и отказах очереди записи"""
+    return helpers.streaming_bulk(
+        es,
+        actions,
+        chunk_size=batch_size,
+        max_chunk_bytes=max_bytes,
+        max_retries=BULK_MAX_RETRIES,
+        initial_backoff=BULK_INITIAL_BACKOFF,
+        max_backoff=BULK_MAX_BACKOFF,
+        raise_on_error=False,
+        raise_on_exception=False
+    )
+
+def new_import_stats() -> dict:
+    """Создает счетчики импорта"""
+    return {"rows": 0, "indexed": 0, "failed": 0, "skipped": 0, "deleted": 0, "unavailable": 0, "errors": []}
+
+def get_import_failure(stats: dict, unavailable: int = 0) -> Optional[str]:
+    """Причина, по которой загрузку нельзя считать успешной, или None.
+    unavailable - сколько сбоев Elasticsearch уже учтено до начала проверяемого участка"""
+    if stats["unavailable"] > unavailable:
+        return "Elasticsearch не принял часть документов"
+    if stats["failed"] > BULK_MAX_FAILED_DOCS:
+        return f"Elasticsearch отклонил документов: {stats['failed']}"
+    return None
+
+def add_progress(progress: dict, key: str, value: int):
+    """Увеличивает счетчик прогресса фоновой задачи, если он передан"""
+    if progress is not None:
+        progress[key] = progress.get(key, 0) + value
+
+def bulk_index_actions(actions, stats: dict, index_name: str, batch_size: int = BULK_BATCH_SIZE,
+                       max_bytes: int = BULK_MAX_BYTES) -> dict:
+    """Загружает действия пакетами через _bulk и собирает ошибки по документам"""
+    for ok, item in send_bulk(actions, batch_size, max_bytes):
+        record_bulk_result(stats, ok, item)
+
+        processed = stats["indexed"] + stats["failed"] + stats["deleted"]
+        if processed % batch_size == 0:
+            print(f"Обработано {stats['rows']} строк | Добавлено {stats['indexed']} документов в {index_name}")
+
+    return stats
+
+def parallel_bulk_index_actions(actions, stats: dict, index_name: str, workers: int = BULK_WORKERS,
+                                queue_size: int = BULK_QUEUE_SIZE,
+                                batch_size: int = BULK_BATCH_SIZE,
+                                max_bytes: int = BULK_MAX_BYTES) -> dict:
+    """Загружает действия несколькими потоками через ограниченную очередь пакетов"""
+    batches = queue.Queue(maxsize=queue_size)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            try:
+                results = list(send_bulk(batch, batch_size, max_bytes))
+            except Exception as bulk_error:
+                results = [(False, {"error": str(bulk_error)})] * len(batch)
+            with lock:
+                for ok, item in results:
+                    record_bulk_result(stats, ok, item)
+                print(f"Обработано {stats['rows']} строк | Добавлено {stats['indexed']} документов в {index_name}")
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
     try:
-        return float(value) if value else None
-    except (ValueError, TypeError):
-        return None
+        # Очередь ограничена, поэтому чтение CSV приостанавливается, пока воркеры заняты
+        batch = []
+        for action in actions:
+            batch.append(action)
+            if len(batch) >= batch_size:
+                batches.put(batch)
+                batch = []
+        if batch:
+            batches.put(batch)
+    finally:
+        for _ in threads:
+            batches.put(None)
+        for thread in threads:
+            thread.join()
+
+    return stats
+
+def index_actions(actions, stats: dict, index_name: str, batch_size: int = BULK_BATCH_SIZE,
+                  workers: int = BULK_WORKERS):
+    """Загружает поток действий _bulk и выводит итоговую статистику"""
+    try:
+        started = time.monotonic()
+        if workers > 1:
+            parallel_bulk_index_actions(actions, stats, index_name, workers=workers, batch_size=batch_size)
+        else:
+            bulk_index_actions(actions, stats, index_name, batch_size=batch_size)
+        elapsed = time.monotonic() - started
+        rate = stats["indexed"] / elapsed if elapsed > 0 else 0.0
+
+        print(f"Импорт в {index_name} завершен. Всего строк: {stats['rows']}, "
+              f"успешно добавлено: {stats['indexed']}, ошибок: {stats['failed']}, "
+              f"время: {elapsed:.1f} с, скорость: {rate:.0f} док/с")
+        for error in stats["errors"]:
+            print(f"Ошибка индексации документа: {error}")
+
+        if stats["indexed"] > 0:
+            count = es.count(index=resolve_index(index_name))['count']
+            print(f"Документов в индексе {index_name}: {count}")
+
+        # Ошибки отдельных документов не вызывают исключений, но и неполный индекс публиковать нельзя
+        failure = get_import_failure(stats)
+        if failure is not None:
+            print(f"Критическая ошибка импорта в {index_name}: {failure}")
+            return False
 
-def import_to_elasticsearch(file_path: str, index_name: str):
-    """Обновленная функция импорта с поддержкой разных индексов"""
+        return True
+
+    except Exception as e:
+        print(f"Критическая ошибка импорта в {index_name}: {str(e)}")
+        return False
+
+def index_rows(rows, index_name: str, batch_size: int = BULK_BATCH_SIZE, workers: int = BULK_WORKERS,
+               stats: dict = None):
+    """Загружает поток строк в индекс и выводит итоговую статистику"""
+    stats = stats if stats is not None else new_import_stats()
+    actions = generate_bulk_actions(rows, index_name, stats)
+    return index_actions(actions, stats, index_name, batch_size=batch_size, workers=workers)
+
+def import_to_elasticsearch(file_path: str, index_name: str, batch_size: int = BULK_BATCH_SIZE,
+                            workers: int = BULK_WORKERS, stats: dict = None, checkpoint: dict = None):
+    """Обновленная функция импорта с поддержкой разных индексов и пакетной загрузкой"""
     if not os.path.exists(file_path):
         print(f"Ошибка: файл {file_path} не найден!")
         return False
 
+    if IMPORT_CHECKPOINTS or checkpoint is not None:
+        return checkpointed_import(file_path, index_name, batch_size=batch_size, workers=workers,
+                                   stats=stats, checkpoint=checkpoint)
+
+    return index_rows(iter_staging_rows(file_path), index_name, batch_size=batch_size, workers=workers, stats=stats)
+
+def get_checkpoint_path(index_name: str) -> str:
+    """Путь к файлу контрольной точки загрузки индекса"""
+    return os.path.join(CSV_FOLDER, CHECKPOINT_DIR, f"{index_name}.json")
+
+def new_checkpoint(file_path: str, index_name: str) -> dict:
+    """Контрольная точка импорта с начала файла"""
+    file_stat = os.stat(file_path)
+    return {
+        "file": os.path.abspath(file_path),
+        "alias": index_name,
+        "index": resolve_index(index_name),  # Поколение индекса, в которое идет загрузка
+        "file_size": file_stat.st_size,
+        "file_mtime": file_stat.st_mtime,
+        "offset": 0,  # Байт, с которого начинается первая незагруженная строка (для Parquet - номер строки)
+        "row": 0,  # Количество загруженных строк
+        "done": False
+    }
+
+def save_checkpoint(checkpoint: dict):
+    """Атомарно записывает контрольную точку"""
+    path = get_checkpoint_path(checkpoint["alias"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+def remove_checkpoint(index_name: str):
+    """Удаляет контрольную точку после переключения или отмены загрузки"""
+    path = get_checkpoint_path(index_name)
+    if os.path.exists(path):
+        os.remove(path)
+
+def load_checkpoints() -> list:
+    """Контрольные точки прерванных загрузок"""
+    checkpoints = []
+    for path in sorted(glob.glob(os.path.join(CSV_FOLDER, CHECKPOINT_DIR, "*.json"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoints.append(json.load(f))
+    return checkpoints
+
+def iter_csv_rows_with_offsets(csvfile, offset: int = 0):
+    """Читает CSV из бинарного файла и отдает строки вместе со смещением конца записи.
+
+    csv.reader запрашивает строки файла только по мере надобности, поэтому после
+    каждой записи счетчик указывает точно на начало следующей.
+    """
+    position = [0]
+
+    def lines():
+        for line in csvfile:
+            position[0] += len(line)
+            yield line.decode('utf-8')
+
+    csvfile.seek(0)
+    convert = make_row_converter(next(csv.reader(lines())))
+    if offset > position[0]:
+        csvfile.seek(offset)
+        position[0] = offset
+
+    for values in csv.reader(lines()):
+        yield convert(values), position[0]
+
+def iter_parquet_rows_with_offsets(file_path: str, offset: int = 0):
+    """Отдает строки Parquet файла вместе с номером следующей строки; уже загруженные группы строк пропускаются"""
+    parquet_file = pq.ParquetFile(file_path)
+    position = 0
+    first_group = 0
+    while first_group < parquet_file.num_row_groups:
+        group_rows = parquet_file.metadata.row_group(first_group).num_rows
+        if position + group_rows > offset:
+            break
+        position += group_rows
+        first_group += 1
+    row_groups = list(range(first_group, parquet_file.num_row_groups))
+
+    for batch in parquet_file.iter_batches(batch_size=VALIDATION_CHUNK_SIZE, row_groups=row_groups):
+        for row in parquet_batch_rows(batch):
+            position += 1
+            if position > offset:
+                yield row, position
+
+def iter_staging_rows_with_offsets(file_path: str, offset: int = 0):
+    """Строки промежуточного файла с позицией для контрольной точки"""
+    if is_parquet(file_path):
+        yield from iter_parquet_rows_with_offsets(file_path, offset)
+        return
+
+    with open(file_path, 'rb') as csvfile:
+        yield from iter_csv_rows_with_offsets(csvfile, offset)
+
+def generate_checkpoint_segment(rows, index_name: str, stats: dict, checkpoint: dict):
+    """Действия _bulk для очередного участка файла; _id по номеру строки (или из document_id
+    при инкрементальной загрузке), поэтому повтор участка идемпотентен"""
+    for row, end_offset in rows:
+        stats["rows"] += 1
+        checkpoint["pending_offset"] = end_offset
+        try:
+            doc_id, source = row_to_source(row, index_name)
+        except Exception as doc_error:
+            print(f"Ошибка в строке {stats['rows']}: {doc_error}")
+            continue
+
+        if source is None:
+            continue
+
+        action = make_source_action(doc_id, source, index_name)
+        action.setdefault("_id", f"row-{stats['rows']}")
+        yield action
+
+        if stats["rows"] - checkpoint["row"] >= IMPORT_CHECKPOINT_ROWS:
+            break
+
+def checkpointed_import(file_path: str, index_name: str, batch_size: int = BULK_BATCH_SIZE,
+                        workers: int = BULK_WORKERS, stats: dict = None, checkpoint: dict = None):
+    """Импорт CSV участками с сохранением позиции после каждого подтвержденного участка"""
+    stats = stats if stats is not None else new_import_stats()
+    checkpoint = checkpoint if checkpoint is not None else new_checkpoint(file_path, index_name)
+    stats["rows"] = checkpoint["row"]
+    if checkpoint["row"]:
+        print(f"Продолжение импорта {file_path} в {index_name} со строки {checkpoint['row'] + 1}")
+
     try:
-        with open(file_path, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            total_docs = 0
-            
-            for i, row in enumerate(reader, 1):
-                try:
-                    doc = {
-                        "id": safe_int_conversion(row.get("id")),
-                        "created_on": parse_date(row.get("created_on")),
-                        "updated_on": parse_date(row.get("updated_on")),
-                        "name": row.get("name", "").strip(),
-                        "ci_code": row.get("ci_code", "").strip(),
-                        "short_name": row.get("short_name", "").strip(),
-                        "full_name": row.get("full_name", "").strip(),
-                        "description": row.get("description", "").strip(),
-                        "notes": row.get("notes", "").strip(),
-                        "status": row.get("status", "").strip(),
-                        "manufacturer": row.get("manufacturer", "").strip(),
-                        "serial": row.get("serial", "").strip(),
-                        "model": row.get("model", "").strip(),
-                        "location": row.get("location", "").strip(),
-                        "mount": row.get("mount", "").strip(),
-                        "hostname": row.get("hostname", "").strip(),
-                        "dns": row.get("dns", "").strip(),
-                        "ip": row.get("ip", "").strip(),
-                        "cpu_cores": safe_int_conversion(row.get("cpu_cores")),
-                        "cpu_freq": safe_float_conversion(row.get("cpu_freq")),
-                        "ram": safe_int_conversion(row.get("ram")),
-                        "total_volume": safe_int_conversion(row.get("total_volume")),
-                        "type": row.get("type", "").strip(),
-                        "category": row.get("category", "").strip(),
-                        "user_org": row.get("user_org", "").strip(),
-                        "owner_org": row.get("owner_org", "").strip(),
-                        "code_mon": row.get("code_mon", "").strip()
-                    }
-                    
-                    # Для невалидных записей добавляем информацию об ошибках валидации
-                    if index_name == "deleted_db":
-                        doc["validation_errors"] = get_validation_errors(row)
-                    
-                    doc = {k: v for k, v in doc.items() if v not in (None, "")}
-                    
-                    if doc:
-                        es.index(
-                            index=index_name,
-                            document=doc,
-                            id=doc.get("id")  # Используем id как идентификатор документа
-                        )
-                        total_docs += 1
-                        
-                    if i % 100 == 0:
-                        print(f"Обработано {i} строк | Добавлено {total_docs} документов в {index_name}")
-                        
-                except Exception as doc_error:
-                    print(f"Ошибка в строке {i}: {doc_error}")
-                    continue
-            
-            print(f"Импорт в {index_name} завершен. Всего строк: {i}, успешно добавлено: {total_docs}")
-            
-            if total_docs > 0:
-                count = es.count(index=index_name)['count']
-                print(f"Документов в индексе {index_name}: {count}")
-            
-            return True
-            
+        started = time.monotonic()
+        with contextlib.closing(iter_staging_rows_with_offsets(file_path, checkpoint["offset"])) as rows:
+            while True:
+                checkpoint["pending_offset"] = None
+                unavailable = stats["unavailable"]
+                segment = generate_checkpoint_segment(rows, index_name, stats, checkpoint)
+                if workers > 1:
+                    parallel_bulk_index_actions(segment, stats, index_name, workers=workers, batch_size=batch_size)
+                else:
+                    bulk_index_actions(segment, stats, index_name, batch_size=batch_size)
+                failure = get_import_failure(stats, unavailable)
+                if failure is not None:
+                    raise Exception(failure)
+                if checkpoint["pending_offset"] is None:
+                    break
+
+                # Участок подтвержден Elasticsearch: фиксируем позицию
+                checkpoint["offset"] = checkpoint.pop("pending_offset")
+                checkpoint["row"] = stats["rows"]
+                save_checkpoint(checkpoint)
+
+        checkpoint.pop("pending_offset", None)
+        checkpoint["done"] = True
+        save_checkpoint(checkpoint)
+
+        elapsed = time.monotonic() - started
+        rate = stats["indexed"] / elapsed if elapsed > 0 else 0.0
+        print(f"Импорт в {index_name} завершен. Всего строк: {stats['rows']}, "
+              f"успешно добавлено: {stats['indexed']}, ошибок: {stats['failed']}, "
+              f"время: {elapsed:.1f} с, скорость: {rate:.0f} док/с")
+        for error in stats["errors"]:
+            print(f"Ошибка индексации документа: {error}")
+        return True
+
     except Exception as e:
-        print(f"Критическая ошибка импорта в {index_name}: {str(e)}")
+        if os.path.exists(get_checkpoint_path(index_name)):
+            print(f"Критическая ошибка импорта в {index_name}: {str(e)}. "
+                  f"Импорт можно продолжить со строки {checkpoint['row'] + 1}")
+        else:
+            print(f"Критическая ошибка импорта в {index_name}: {str(e)}")
         return False
 
+def resume_imports(stats_factory=new_import_stats) -> list:
+    """Продолжает прерванные загрузки с последних контрольных точек и переключает алиасы"""
+    checkpoints = load_checkpoints()
+    for checkpoint in checkpoints:
+        if not es.indices.exists(index=checkpoint["index"]):
+            remove_checkpoint(checkpoint["alias"])
+            raise Exception(f"Индекс {checkpoint['index']} прерванной загрузки не найден")
+        file_stat = os.stat(checkpoint["file"])
+        if (file_stat.st_size, file_stat.st_mtime) != (checkpoint["file_size"], checkpoint["file_mtime"]):
+            raise Exception(f"Файл {checkpoint['file']} изменился после начала загрузки")
+
+        index_builds[checkpoint["alias"]] = checkpoint["index"]
+        if not checkpoint["done"]:
+            if not checkpointed_import(checkpoint["file"], checkpoint["alias"], stats=stats_factory(),
+                                       checkpoint=checkpoint):
+                raise Exception(f"Ошибка при продолжении импорта в {checkpoint['alias']}")
+
+    for checkpoint in checkpoints:
+        publish_index_build(checkpoint["alias"])
+    return [checkpoint["alias"] for checkpoint in checkpoints]
+
+def uses_stable_ids(index_name: str) -> bool:
+    """Получают ли документы индекса постоянный _id и content_hash.
+    Полная пересборка при включенной инкрементальной загрузке служит основой для следующей"""
+    return IMPORT_INCREMENTAL and index_name == INCREMENTAL_INDEX
+
+def document_id(row: tuple) -> Optional[str]:
+    """Постоянный идентификатор документа по полям INCREMENTAL_KEY_FIELDS.
+    Значения берутся как есть, как в ключе дедупликации"""
+    values = [row[position] for position in INCREMENTAL_KEY_POSITIONS]
+    if not any(values):
+        return None
+    if len(values) == 1:
+        return values[0]
+    return hashlib.sha1("\x1f".join(values).encode('utf-8')).hexdigest()
+
+def content_hash(doc: dict) -> str:
+    """Хэш содержимого документа для поиска измененных строк.
+    Поля идут в порядке схемы, как их собирают row_to_document и row_to_source"""
+    data = json.dumps(doc, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+def with_content_hash(doc: dict) -> dict:
+    """Копия документа с полем content_hash"""
+    return dict(doc, content_hash=content_hash(doc))
+
+def make_result_action(doc: dict, row: tuple) -> dict:
+    """Действие _bulk для лучшей строки в result_db"""
+    if uses_stable_ids("result_db"):
+        return make_bulk_action(with_content_hash(doc), "result_db", document_id(row))
+    return make_bulk_action(doc, "result_db")
+
+def incremental_ready(index_name: str) -> bool:
+    """Можно ли дополнить индекс инкрементально: он собран с постоянными _id по текущему ключу.
+    Иначе, например после загрузки с выключенной инкрементальностью, индекс пересобирается полностью"""
+    if not es.indices.exists(index=index_name):
+        return False
+    for mapping in es.indices.get_mapping(index=index_name).values():
+        if mapping["mappings"].get("_meta", {}).get("document_key") != INCREMENTAL_KEY_FIELDS:
+            print(f"Индекс {index_name} собран без постоянных _id по ключу "
+                  f"{', '.join(INCREMENTAL_KEY_FIELDS)}, он будет пересобран полностью")
+            return False
+    return True
+
+def get_content_hashes(index_name: str) -> dict:
+    """Загружает _id и хэши содержимого всех документов индекса"""
+    return {
+        hit["_id"]: hit["_source"].get("content_hash")
+        for hit in helpers.scan(es, index=index_name, query={"_source": ["content_hash"]})
+    }
+
+def generate_incremental_actions(rows, index_name: str, stats: dict, existing: dict,
+                                 delete_missing: bool = INCREMENTAL_DELETE_MISSING):
+    """Генерирует действия только для новых и измененных строк и, при необходимости, удаления"""
+    seen = set()
+    for i, row in enumerate(rows, 1):
+        stats["rows"] = i
+        try:
+            doc = row_to_document(row, index_name)
+        except Exception as doc_error:
+            print(f"Ошибка в строке {i}: {doc_error}")
+            continue
+
+        doc_id = document_id(row)
+        if not doc or doc_id is None:
+            continue
+
+        seen.add(doc_id)
+        doc["content_hash"] = content_hash(doc)
+        if existing.get(doc_id) == doc["content_hash"]:
+            stats["skipped"] += 1
+            continue
+        yield {"_index": index_name, "_id": doc_id, "_source": doc}
+
+    if delete_missing:
+        for doc_id in existing.keys() - seen:
+            yield {"_op_type": "delete", "_index": index_name, "_id": doc_id}
+
+def incremental_index_rows(rows, index_name: str, stats: dict = None,
+                           delete_missing: bool = INCREMENTAL_DELETE_MISSING):
+    """Загружает в существующий индекс только изменения"""
+    stats = stats if stats is not None else new_import_stats()
+    existing = get_content_hashes(index_name)
+    actions = generate_incremental_actions(rows, index_name, stats, existing, delete_missing)
+    if not index_actions(actions, stats, index_name):
+        return False
+
+    print(f"Инкрементальная загрузка в {index_name}: без изменений {stats['skipped']}, "
+          f"удалено {stats['deleted']}")
+    es.indices.refresh(index=index_name)
+    invalidate_search_cache(index_name)
+    return True
+
+def incremental_import(file_path: str, index_name: str, stats: dict = None,
+                       delete_missing: bool = INCREMENTAL_DELETE_MISSING):
+    """Инкрементальная загрузка CSV или Parquet файла в существующий индекс"""
+    if not os.path.exists(file_path):
+        print(f"Ошибка: файл {file_path} не найден!")
+        return False
+
+    return incremental_index_rows(iter_staging_rows(file_path), index_name, stats=stats,
+                                  delete_missing=delete_missing)
+
 def get_etalon_headers():
-    """Получает заголовки из fields.csv"""
-    fields_path = os.path.join(CSV_FOLDER, 'fields.csv')
-    if not os.path.exists(fields_path):
-        raise FileNotFoundError("Файл fields.csv не найден в папке db")
-    
-    with open(fields_path, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        return next(reader)
-
-def merge_csv():
-    """Объединяет первые 1000 строк из каждого CSV файла"""
+    """Получает заголовки из fields.csv (загружены вместе со схемой)"""
+    return list(ROW_FIELDS)
+
+def get_source_csv_files() -> list:
+    """Возвращает загруженные CSV файлы без служебных и промежуточных файлов"""
+    service_files = {'fields.csv', MERGED, RESULT, DELETED}
+    return sorted(
+        f for f in os.listdir(CSV_FOLDER)
+        if f.endswith('.csv') and f not in service_files
+    )
+
+def get_staging_path(filename: str) -> str:
+    """Путь к промежуточному файлу в формате STAGING_FORMAT: input.csv или input.parquet"""
+    if STAGING_FORMAT == "parquet":
+        filename = os.path.splitext(filename)[0] + ".parquet"
+    return os.path.join(CSV_FOLDER, filename)
+
+def is_parquet(path: str) -> bool:
+    """Промежуточный файл в формате Parquet"""
+    return path.endswith(".parquet")
+
+def get_staging_size(path: str) -> int:
+    """Примерный размер данных файла в виде CSV, для Parquet - несжатый размер колонок"""
+    if is_parquet(path):
+        metadata = pq.ParquetFile(path).metadata
+        return sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups))
+    return os.path.getsize(path)
+
+def open_staging_writer(path: str, headers: list, append: bool = False, parquet: bool = None):
+    """Открывает промежуточный файл для записи блоками DataFrame.
+    Возвращает функции записи блока и закрытия файла; по умолчанию формат определяется расширением"""
+    if parquet is None:
+        parquet = is_parquet(path)
+    if not parquet:
+        f = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        if not append:
+            csv.writer(f).writerow(headers)
+
+        def write(frame):
+            frame.to_csv(f, header=False, index=False)
+        return write, f.close
+
+    schema = pa.schema([(field, pa.string()) for field in headers])
+    previous = None
+    if append and os.path.exists(path):
+        # Parquet нельзя дописать: прежние строки переносятся в новый файл
+        previous = path + ".prev"
+        os.replace(path, previous)
+    writer = pq.ParquetWriter(path, schema, compression=PARQUET_COMPRESSION)
+    if previous is not None:
+        for batch in pq.ParquetFile(previous).iter_batches():
+            writer.write_batch(batch)
+        os.remove(previous)
+
+    def write(frame):
+        writer.write_table(pa.Table.from_pandas(frame.fillna(''), schema=schema, preserve_index=False))
+    return write, writer.close
+
+def write_staging_rows(write, rows, headers: list, chunk_size: int = VALIDATION_CHUNK_SIZE) -> int:
+    """Записывает строки-кортежи через функцию записи open_staging_writer блоками"""
+    count = 0
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, chunk_size)):
+        write(pd.DataFrame(batch, columns=headers))
+        count += len(batch)
+    return count
+
+def parquet_batch_rows(batch):
+    """Строки блока Parquet кортежами в порядке полей схемы"""
+    columns = batch.to_pydict()
+    empty = [''] * batch.num_rows
+    return zip(*(columns.get(field, empty) for field in ROW_FIELDS))
+
+def iter_staging_chunks(path: str, etalon_headers: list, chunk_size: int = VALIDATION_CHUNK_SIZE):
+    """Читает промежуточный файл блоками DataFrame с эталонными колонками"""
+    if is_parquet(path):
+        parquet_file = pq.ParquetFile(path)
+        columns = [field for field in etalon_headers if field in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas().reindex(columns=etalon_headers, fill_value='')
+        return
+
+    reader = pd.read_csv(path, encoding='utf-8', dtype=str, keep_default_na=False, chunksize=chunk_size)
+    for chunk in reader:
+        yield chunk.reindex(columns=etalon_headers, fill_value='')
+
+def iter_staging_rows(path: str):
+    """Читает промежуточный файл построчно кортежами в порядке полей схемы"""
+    if is_parquet(path):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=VALIDATION_CHUNK_SIZE):
+            yield from parquet_batch_rows(batch)
+        return
+
+    with open(path, 'r', encoding='utf-8') as csvfile:
+        yield from iter_csv_rows(csvfile)
+
+def iter_merged_chunks(etalon_headers: list, chunk_size: int = MERGE_CHUNK_SIZE, progress: dict = None):
+    """Читает загруженные CSV файлы блоками и приводит каждый блок к эталонным колонкам"""
+    for filename in get_source_csv_files():
+        file_path = os.path.join(CSV_FOLDER, filename)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                file_headers = next(csv.reader(f), [])
+
+            missing_cols = set(etalon_headers) - set(file_headers)
+            if missing_cols:
+                print(f"В файле {filename} отсутствуют колонки: {missing_cols}")
+                continue
+
+            rows_count = 0
+            reader = pd.read_csv(
+                file_path,
+                encoding='utf-8',
+                sep=',',
+                dtype=str,
+                keep_default_na=False,
+                usecols=etalon_headers,
+                chunksize=chunk_size
+            )
+            for chunk in reader:
+                rows_count += len(chunk)
+                add_progress(progress, "rows_read", len(chunk))
+                yield chunk[etalon_headers]
+            print(f"Обработан файл {filename} (строк: {rows_count})")
+
+        except Exception as file_error:
+            print(f"Ошибка при обработке файла {filename}: {str(file_error)}")
+            continue
+
+def iter_merged_rows(chunk_size: int = MERGE_CHUNK_SIZE, progress: dict = None):
+    """Отдает строки всех загруженных CSV файлов по одной, не создавая input.csv"""
+    etalon_headers = get_etalon_headers()
+    for chunk in iter_merged_chunks(etalon_headers, chunk_size, progress):
+        yield from chunk.itertuples(index=False, name=None)
+
+def merge_csv(chunk_size: int = MERGE_CHUNK_SIZE, progress: dict = None):
+    """Потоково объединяет все CSV файлы в input.csv (или input.parquet), храня в памяти не более одного блока"""
     try:
         etalon_headers = get_etalon_headers()
-        csv_files = [f for f in os.listdir(CSV_FOLDER) 
-                    if f.endswith('.csv') and f != 'fields.csv']
-        
-        if not csv_files:
+        if not get_source_csv_files():
             print("Нет CSV файлов для обработки")
             return None
-        
-        dfs = []
-        for filename in csv_files:
-            file_path = os.path.join(CSV_FOLDER, filename)
-            try:
-                df = pd.read_csv(
-                    file_path,
-                    encoding='utf-8',
-                    sep=',',
-                    nrows=1000
-                )
-                
-                missing_cols = set(etalon_headers) - set(df.columns)
-                if missing_cols:
-                    print(f"В файле {filename} отсутствуют колонки: {missing_cols}")
-                
-                df = df[etalon_headers]
-                dfs.append(df)
-                print(f"Обработан файл {filename} (строк: {len(df)})")
-                
-            except Exception as file_error:
-                print(f"Ошибка при обработке файла {filename}: {str(file_error)}")
-                continue
-        
-        if not dfs:
+
+        merged_path = get_staging_path(MERGED)
+        tmp_path = merged_path + '.tmp'
+        total_rows = 0
+
+        write, close = open_staging_writer(tmp_path, etalon_headers, parquet=is_parquet(merged_path))
+        try:
+            for chunk in iter_merged_chunks(etalon_headers, chunk_size, progress):
+                write(chunk)
+                total_rows += len(chunk)
+        finally:
+            close()
+
+        if total_rows == 0:
+            os.remove(tmp_path)
             print("Нет данных для объединения")
             return None
-        
-        result = pd.concat(dfs, ignore_index=True)
-        merged_path = os.path.join(CSV_FOLDER, MERGED)
-        result.to_csv(merged_path, index=False, encoding='utf-8', sep=',')
-        print(f"Объединенный файл сохранен: {merged_path} (строк: {len(result)})")
-        
+
+        os.replace(tmp_path, merged_path)
+        print(f"Объединенный файл сохранен: {merged_path} (строк: {total_rows})")
+
         return merged_path
-        
+
     except Exception as e:
         print(f"Критическая ошибка при объединении файлов: {str(e)}")
         return None
@@ -326,221 +1296,853 @@ def add_to_deleted(row):
         print(f"Ошибка при добавлении в deleted.csv: {str(e)}")
         return False
 
-def validate_csv(input_path: str, result_path: str, deleted_path: str):
-    """Проверяет input.csv и разделяет данные на valid (result.csv) и invalid (deleted.csv)"""
+def get_reward(row: tuple) -> int:
+    """Оценка строки при выборе лучшей среди дубликатов: сумма весов q заполненных полей.
+    Чем полнее строка, тем выше оценка (в delete_dub.py веса считались по пустым полям,
+    и побеждали самые пустые строки)"""
+    reward = 0
+    for position, weight in REWARD_POSITIONS:
+        reward += weight * (row[position] != '')
+    return reward
+
+def score_dataframe(df: pd.DataFrame) -> np.ndarray:
+    """Поколоночный аналог get_reward: матрица заполненных полей, умноженная на вектор весов q"""
+    filled = np.column_stack([
+        (df[field] != '').to_numpy(dtype=bool) if field in df.columns else np.zeros(len(df), dtype=bool)
+        for field in REWARD_FIELDS
+    ])
+    return filled.astype(np.int64) @ REWARD_WEIGHTS
+
+def select_best_rows(df: pd.DataFrame):
+    """Выбирает лучшую строку в каждой группе ключа UNIQUE_CODES групповым argmax.
+
+    Возвращает оценки строк и маску победителей. В каждой группе ровно один
+    победитель: строка с максимальной оценкой, при равенстве - первая.
+    """
+    rewards = score_dataframe(df)
+    winners = np.zeros(len(df), dtype=bool)
+    if len(df) == 0:
+        return rewards, winners
+
+    groups = df.groupby(UNIQUE_CODES, sort=False, dropna=False).ngroup().to_numpy()
+    order = np.lexsort((np.arange(len(df)), -rewards, groups))
+    first_in_group = np.ones(len(order), dtype=bool)
+    first_in_group[1:] = groups[order[1:]] != groups[order[:-1]]
+    winners[order[first_in_group]] = True
+    return rewards, winners
+
+def dedup_offer(best_rows: dict, row: tuple, reward: int = None):
+    """Добавляет строку в индекс лучших строк по ключу UNIQUE_CODES.
+
+    В индексе хранится только текущая лучшая строка каждого ключа и ее оценка.
+    Возвращает вытесненную строку или None. Первая строка ключа сохраняется всегда,
+    следующая вытесняет ее только при строго большей оценке.
+    Оценку можно передать заранее, если она посчитана поколоночно.
+    """
+    key = tuple(row[position] for position in UNIQUE_POSITIONS)
+    if reward is None:
+        reward = get_reward(row)
+    best = best_rows.get(key)
+    if best is None or reward > best[0]:
+        best_rows[key] = (reward, row)
+        return best[1] if best is not None else None
+    return row
+
+def iter_dedup_winners(best_rows: dict):
+    """Отдает лучшие строки из индекса дедупликации"""
+    for _, row in best_rows.values():
+        yield row
+
+def write_dedup_winners(result_file, best_rows: dict) -> int:
+    """Дописывает лучшие строки в открытый result.csv и возвращает их количество"""
+    writer = csv.writer(result_file)
+    for _, values in best_rows.values():
+        writer.writerow(values)
+    return len(best_rows)
+
+def get_dedup_partitions(input_size: int, workers: int = DEDUP_WORKERS) -> int:
+    """Подбирает число разделов так, чтобы одновременно обрабатываемые разделы помещались в DEDUP_MEMORY_LIMIT"""
+    partition_limit = DEDUP_MEMORY_LIMIT / max(workers, 1)
+    return max(workers, math.ceil(input_size * DEDUP_MEMORY_FACTOR / partition_limit))
+
+def partition_index(row: tuple, partitions: int) -> int:
+    """Номер раздела строки по хэшу ключа UNIQUE_CODES"""
+    key = '\x1f'.join(row[position] for position in UNIQUE_POSITIONS)
+    return zlib.crc32(key.encode('utf-8')) % partitions
+
+def open_spill_files(spill_dir: str, partitions: int):
+    """Открывает файлы разделов на запись"""
+    paths = [os.path.join(spill_dir, f"part_{i}.csv") for i in range(partitions)]
+    files = [open(path, 'w', encoding='utf-8', newline='') for path in paths]
+    return paths, files, [csv.writer(f) for f in files]
+
+def spill_rows(rows, spill_dir: str, partitions: int) -> list:
+    """Раскладывает строки по файлам разделов и возвращает пути к ним"""
+    paths, files, writers = open_spill_files(spill_dir, partitions)
     try:
-        etalon_headers = get_etalon_headers()
-        
-        with open(input_path, 'r', encoding='utf-8') as input_file, \
-             open(result_path, 'w', encoding='utf-8', newline='') as result_file, \
+        for row in rows:
+            writers[partition_index(row, partitions)].writerow(row)
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+def dedup_partition(path: str, headers: list) -> dict:
+    """Дедуплицирует один раздел; выполняется в отдельном процессе"""
+    losers_path = path + '.losers'
+    winners_path = path + '.winners'
+
+    if os.path.getsize(path) > 0:
+        partition = pd.read_csv(path, header=None, names=headers, dtype=str, keep_default_na=False)
+    else:
+        partition = pd.DataFrame(columns=headers)
+    _, winners = select_best_rows(partition)
+
+    partition[winners].to_csv(winners_path, header=False, index=False, encoding='utf-8')
+    partition[~winners].to_csv(losers_path, header=False, index=False, encoding='utf-8')
+    os.remove(path)
+
+    return {
+        "winners_path": winners_path,
+        "losers_path": losers_path,
+        "valid_count": int(winners.sum()),
+        "duplicate_count": int(len(partition) - winners.sum())
+    }
+
+def dedup_spilled(paths: list, headers: list, workers: int = DEDUP_WORKERS) -> list:
+    """Параллельно дедуплицирует разделы в пуле процессов"""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(dedup_partition, paths, [headers] * len(paths)))
+
+def iter_partition_rows(paths: list):
+    """Читает строки из файлов результатов дедупликации"""
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for values in csv.reader(f):
+                yield tuple(values)
+
+def external_dedup_csv(result_path: str, deleted_path: str, headers: list, workers: int = DEDUP_WORKERS) -> dict:
+    """Дедуплицирует result.csv через разделы на диске, дубликаты дописывает в deleted.csv"""
+    partitions = get_dedup_partitions(get_staging_size(result_path), workers)
+    print(f"Дедупликация вне памяти: разделов {partitions}, процессов {workers}")
+
+    with tempfile.TemporaryDirectory(dir=CSV_FOLDER) as spill_dir:
+        if is_parquet(result_path):
+            paths = spill_rows(iter_staging_rows(result_path), spill_dir, partitions)
+        else:
+            with open(result_path, 'r', encoding='utf-8', newline='') as f:
+                paths = spill_rows(iter_csv_rows(f), spill_dir, partitions)
+
+        results = dedup_spilled(paths, headers, workers)
+
+        if is_parquet(result_path):
+            # Разделы - CSV файлы, их строки переписываются в Parquet
+            write_result, close_result = open_staging_writer(result_path, headers)
+            write_deleted, close_deleted = open_staging_writer(deleted_path, headers, append=True)
+            try:
+                write_staging_rows(write_result, iter_partition_rows([part["winners_path"] for part in results]),
+                                   headers)
+                write_staging_rows(write_deleted, iter_partition_rows([part["losers_path"] for part in results]),
+                                   headers)
+            finally:
+                close_result()
+                close_deleted()
+        else:
+            with open(result_path, 'w', encoding='utf-8', newline='') as result_file, \
+                 open(deleted_path, 'a', encoding='utf-8', newline='') as deleted_file:
+                csv.writer(result_file).writerow(headers)
+                for part in results:
+                    with open(part["winners_path"], 'r', encoding='utf-8', newline='') as src:
+                        shutil.copyfileobj(src, result_file)
+                    with open(part["losers_path"], 'r', encoding='utf-8', newline='') as src:
+                        shutil.copyfileobj(src, deleted_file)
+
+    return {
+        "valid_count": sum(part["valid_count"] for part in results),
+        "duplicate_count": sum(part["duplicate_count"] for part in results)
+    }
+
+def validate_rows_csv(input_path: str, result_path: str, deleted_path: str, etalon_headers: list,
+                      dedup: bool = DEDUP_ENABLED, progress: dict = None) -> dict:
+    """Построчная валидация input.csv"""
+    with open(input_path, 'r', encoding='utf-8') as input_file, \
+         open(result_path, 'w', encoding='utf-8', newline='') as result_file, \
+         open(deleted_path, 'w', encoding='utf-8', newline='') as deleted_file:
+
+        result_writer = csv.writer(result_file)
+        deleted_writer = csv.writer(deleted_file)
+
+        result_writer.writerow(etalon_headers)
+        deleted_writer.writerow(etalon_headers)
+
+        valid_count = 0
+        invalid_count = 0
+        duplicate_count = 0
+        best_rows = {}
+
+        rows_count = 0
+        for row in iter_csv_rows(input_file):
+            rows_count += 1
+            if rows_count % VALIDATION_CHUNK_SIZE == 0:
+                add_progress(progress, "rows_validated", VALIDATION_CHUNK_SIZE)
+            if not all_regular_is_valid(row):
+                deleted_writer.writerow(row)
+                invalid_count += 1
+            elif dedup:
+                loser = dedup_offer(best_rows, row)
+                if loser is not None:
+                    deleted_writer.writerow(loser)
+                    duplicate_count += 1
+            else:
+                result_writer.writerow(row)
+                valid_count += 1
+
+        add_progress(progress, "rows_validated", rows_count % VALIDATION_CHUNK_SIZE)
+        if dedup:
+            valid_count = write_dedup_winners(result_file, best_rows)
+
+    return {"valid_count": valid_count, "invalid_count": invalid_count, "duplicate_count": duplicate_count}
+
+def validate_columnar_csv(input_path: str, result_path: str, deleted_path: str, etalon_headers: list,
+                          dedup: bool = DEDUP_ENABLED, progress: dict = None) -> dict:
+    """Поколоночная валидация input.csv или input.parquet блоками pandas"""
+    valid_count = 0
+    invalid_count = 0
+    duplicate_count = 0
+    best_rows = {}
+
+    write_result, close_result = open_staging_writer(result_path, etalon_headers)
+    write_deleted, close_deleted = open_staging_writer(deleted_path, etalon_headers)
+    try:
+        for chunk in iter_staging_chunks(input_path, etalon_headers):
+            valid_mask, _ = validate_dataframe(chunk)
+
+            deleted = chunk[~valid_mask]
+            if dedup:
+                # Внутри блока лучшие строки выбираются поколоночно, в индекс попадают только они
+                valid = chunk[valid_mask]
+                rewards, winners = select_best_rows(valid)
+                losers = []
+                for row, reward in zip(valid[winners].itertuples(index=False, name=None), rewards[winners].tolist()):
+                    loser = dedup_offer(best_rows, row, reward)
+                    if loser is not None:
+                        losers.append(loser)
+                duplicate_count += len(losers) + int((~winners).sum())
+                deleted = pd.concat(
+                    [deleted, valid[~winners], pd.DataFrame(losers, columns=etalon_headers)],
+                    ignore_index=True
+                )
+            else:
+                write_result(chunk[valid_mask])
+                valid_count += int(valid_mask.sum())
+
+            write_deleted(deleted)
+
+            invalid_count += len(chunk) - int(valid_mask.sum())
+            add_progress(progress, "rows_validated", len(chunk))
+
+        if dedup:
+            valid_count = write_staging_rows(write_result, iter_dedup_winners(best_rows), etalon_headers)
+    finally:
+        close_result()
+        close_deleted()
+
+    return {"valid_count": valid_count, "invalid_count": invalid_count, "duplicate_count": duplicate_count}
+
+def find_shard_boundaries(input_path: str, shards: int) -> list:
+    """Делит CSV файл на диапазоны байт, выровненные по границам записей.
+
+    Граница ставится на перевод строки вне кавычек: четность числа кавычек
+    от начала данных показывает, находимся ли мы внутри поля в кавычках.
+    """
+    size = os.path.getsize(input_path)
+    with open(input_path, 'rb') as f:
+        data_start = len(f.readline())
+        targets = [data_start + (size - data_start) * i // shards for i in range(1, shards)]
+
+        boundaries = [data_start]
+        pos = data_start
+        parity = 0
+        for target in targets:
+            if target <= pos:
+                continue
+            while pos < target:
+                block = f.read(min(1024 * 1024, target - pos))
+                if not block:
+                    break
+                parity ^= block.count(b'"') & 1
+                pos += len(block)
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                parity ^= line.count(b'"') & 1
+                pos += len(line)
+                if parity == 0:
+                    break
+            if pos < size:
+                boundaries.append(pos)
+
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+def validate_shard(input_path: str, start: int, end: int, file_headers: list, etalon_headers: list,
+                   result_path: str, deleted_path: str) -> dict:
+    """Валидирует один фрагмент input.csv; выполняется в отдельном процессе"""
+    with open(input_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    shard = pd.read_csv(
+        io.BytesIO(data),
+        encoding='utf-8',
+        header=None,
+        names=file_headers,
+        dtype=str,
+        keep_default_na=False
+    )
+    shard = shard.reindex(columns=etalon_headers, fill_value='')
+    valid_mask, _ = validate_dataframe(shard)
+
+    shard[valid_mask].to_csv(result_path, header=False, index=False, encoding='utf-8')
+    shard[~valid_mask].to_csv(deleted_path, header=False, index=False, encoding='utf-8')
+
+    valid_count = int(valid_mask.sum())
+    return {"valid_count": valid_count, "invalid_count": len(shard) - valid_count}
+
+def validate_parallel_csv(input_path: str, result_path: str, deleted_path: str, etalon_headers: list,
+                          workers: int = VALIDATION_WORKERS, progress: dict = None) -> dict:
+    """Валидирует input.csv фрагментами в пуле процессов и склеивает результаты по порядку"""
+    with open(input_path, 'r', encoding='utf-8', newline='') as f:
+        file_headers = next(csv.reader(f), [])
+
+    shards_count = max(workers, math.ceil(os.path.getsize(input_path) / VALIDATION_SHARD_SIZE))
+    shards = find_shard_boundaries(input_path, shards_count)
+    print(f"Параллельная валидация: фрагментов {len(shards)}, процессов {workers}")
+
+    with tempfile.TemporaryDirectory(dir=CSV_FOLDER) as shard_dir:
+        outputs = [
+            (os.path.join(shard_dir, f"shard_{i}.result"), os.path.join(shard_dir, f"shard_{i}.deleted"))
+            for i in range(len(shards))
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(validate_shard, input_path, start, end, file_headers, etalon_headers,
+                            shard_result, shard_deleted)
+                for (start, end), (shard_result, shard_deleted) in zip(shards, outputs)
+            ]
+            results = []
+            for future in futures:
+                results.append(future.result())
+                add_progress(progress, "rows_validated",
+                             results[-1]["valid_count"] + results[-1]["invalid_count"])
+
+        with open(result_path, 'w', encoding='utf-8', newline='') as result_file, \
              open(deleted_path, 'w', encoding='utf-8', newline='') as deleted_file:
-            
-            reader = csv.DictReader(input_file)
-            result_writer = csv.DictWriter(result_file, fieldnames=etalon_headers)
-            deleted_writer = csv.DictWriter(deleted_file, fieldnames=etalon_headers)
-            
-            result_writer.writeheader()
-            deleted_writer.writeheader()
-            
-            valid_count = 0
-            invalid_count = 0
-            
-            for row in reader:
-                if all_regular_is_valid(row):
-                    result_writer.writerow(row)
-                    valid_count += 1
-                else:
-                    deleted_writer.writerow(row)
-                    invalid_count += 1
-            
-            return {
-                "status": "success",
-                "valid_count": valid_count,
-                "invalid_count": invalid_count
-            }
-            
+            csv.writer(result_file).writerow(etalon_headers)
+            csv.writer(deleted_file).writerow(etalon_headers)
+            for shard_result, shard_deleted in outputs:
+                with open(shard_result, 'r', encoding='utf-8', newline='') as src:
+                    shutil.copyfileobj(src, result_file)
+                with open(shard_deleted, 'r', encoding='utf-8', newline='') as src:
+                    shutil.copyfileobj(src, deleted_file)
+
+    return {
+        "valid_count": sum(part["valid_count"] for part in results),
+        "invalid_count": sum(part["invalid_count"] for part in results),
+        "duplicate_count": 0
+    }
+
+def dedup_result_csv(result_path: str, deleted_path: str, headers: list) -> dict:
+    """Дедуплицирует готовый result.csv в памяти, дубликаты дописывает в deleted.csv"""
+    best_rows = {}
+    duplicate_count = 0
+
+    reader = pd.read_csv(result_path, encoding='utf-8', dtype=str, keep_default_na=False,
+                         chunksize=VALIDATION_CHUNK_SIZE)
+    for chunk in reader:
+        chunk = chunk.reindex(columns=headers, fill_value='')
+        rewards, winners = select_best_rows(chunk)
+        losers = []
+        for row, reward in zip(chunk[winners].itertuples(index=False, name=None), rewards[winners].tolist()):
+            loser = dedup_offer(best_rows, row, reward)
+            if loser is not None:
+                losers.append(loser)
+        duplicate_count += len(losers) + int((~winners).sum())
+        deleted = pd.concat([chunk[~winners], pd.DataFrame(losers, columns=headers)], ignore_index=True)
+        deleted.to_csv(deleted_path, mode='a', header=False, index=False, encoding='utf-8')
+
+    with open(result_path, 'w', encoding='utf-8', newline='') as result_file:
+        csv.writer(result_file).writerow(headers)
+        valid_count = write_dedup_winners(result_file, best_rows)
+
+    return {"valid_count": valid_count, "duplicate_count": duplicate_count}
+
+def validate_csv(input_path: str, result_path: str, deleted_path: str, columnar: bool = VALIDATION_COLUMNAR,
+                 workers: int = VALIDATION_WORKERS, progress: dict = None):
+    """Проверяет input.csv и разделяет данные на valid (result.csv) и invalid (deleted.csv).
+    Для input.parquet результаты также пишутся в Parquet"""
+    try:
+        etalon_headers = get_etalon_headers()
+        in_memory_dedup = DEDUP_ENABLED and not DEDUP_EXTERNAL
+
+        if is_parquet(input_path):
+            # Parquet читается блоками без разбора текста; фрагменты по байтам и построчный режим только для CSV
+            counts = validate_columnar_csv(input_path, result_path, deleted_path, etalon_headers,
+                                           dedup=in_memory_dedup, progress=progress)
+        elif workers > 1:
+            # Фрагменты валидируются параллельно, дедупликация выполняется после склейки
+            counts = validate_parallel_csv(input_path, result_path, deleted_path, etalon_headers, workers,
+                                           progress=progress)
+            if in_memory_dedup:
+                counts.update(dedup_result_csv(result_path, deleted_path, etalon_headers))
+        else:
+            if columnar:
+                counts = validate_columnar_csv(input_path, result_path, deleted_path, etalon_headers,
+                                               dedup=in_memory_dedup, progress=progress)
+            else:
+                counts = validate_rows_csv(input_path, result_path, deleted_path, etalon_headers,
+                                           dedup=in_memory_dedup, progress=progress)
+
+        if DEDUP_ENABLED and DEDUP_EXTERNAL:
+            counts.update(external_dedup_csv(result_path, deleted_path, etalon_headers))
+
+        return {
+            "status": "success",
+            "valid_count": counts["valid_count"],
+            "invalid_count": counts["invalid_count"],
+            "duplicate_count": counts["duplicate_count"]
+        }
+
     except Exception as e:
         return {
             "status": "error",
             "message": str(e)
         }
 
-def all_regular_is_valid(row: dict) -> bool:
+def all_regular_is_valid(row: tuple) -> bool:
     """Проверяет строку на соответствие всем регулярным выражениям"""
     try:
-        checks = [
-            re.fullmatch(status_pattern, str(row.get(STATUS, ''))),
-            re.fullmatch(ci_code_pattern, str(row.get(CI_CODE, ''))),
-            re.fullmatch(hostname_pattern, str(row.get(HOSTNAME, ''))),
-            re.fullmatch(dns_pattern, str(row.get(DNS, ''))),
-            re.fullmatch(short_name_pattern, str(row.get(SHORT_NAME, ''))),
-            re.fullmatch(created_on_pattern, str(row.get(CREATED_ON, ''))),
-            re.fullmatch(updated_on_pattern, str(row.get(UPDATED_ON, ''))),
-            re.fullmatch(name_pattern, str(row.get(NAME, ''))),
-            re.fullmatch(id_pattren, str(row.get(ID, ''))),
-            re.fullmatch(type_pattern, str(row.get(TYPE, ''))),
-            re.fullmatch(serial_pattern, str(row.get(SERIAL, ''))),
-            re.fullmatch(full_name_pattern, str(row.get(FULL_NAME, ''))),
-            re.fullmatch(description_pattern, str(row.get(DESCRIPTION, ''))),
-            re.fullmatch(notes_pattern, str(row.get(NOTES, ''))),
-            re.fullmatch(manufacturer_pattern, str(row.get(MANUFACTURER, ''))),
-            re.fullmatch(model_pattern, str(row.get(MODEL, ''))),
-            re.fullmatch(location_pattern, str(row.get(LOCATION, ''))),
-            re.fullmatch(ip_pattern, str(row.get(IP, ''))),
-            re.fullmatch(cpu_cores_pattern, str(row.get(CPU_CORES, ''))),
-            re.fullmatch(cpu_freq_pattern, str(row.get(CPU_FREQ, ''))),
-            re.fullmatch(ram_pattern, str(row.get(RAM, ''))),
-            re.fullmatch(total_volume_pattern, str(row.get(TOTAL_VOLUME, ''))),
-            re.fullmatch(category_pattern, str(row.get(CATEGORY, ''))),
-            re.fullmatch(user_org_pattern, str(row.get(USER_ORG, ''))),
-            re.fullmatch(owner_org_pattern, str(row.get(OWNER_ORG, ''))),
-            re.fullmatch(code_mon_pattern, str(row.get(CODE_MON, ''))),
-            re.fullmatch(mount_pattern, str(row.get(MOUNT, '')))
-        ]
-        return all(checks)
+        for position, regex, _ in ROW_RULES:
+            if not regex.fullmatch(row[position]):
+                return False
+        return True
     except Exception as e:
         print(f"Ошибка валидации строки: {e}")
         return False
 
-def create_result_index():
-    """Создает индекс result_db в Elasticsearch для валидных данных"""
-    if es.indices.exists(index="result_db"):
-        es.indices.delete(index="result_db")
-    
-    mapping = {
-        "mappings": {
-            "properties": {
-                "id": {"type": "integer"},
-                "created_on": {"type": "date"},
-                "updated_on": {"type": "date"},
-                "name": {"type": "text"},
-                "ci_code": {"type": "keyword"},
-                "short_name": {"type": "text"},
-                "full_name": {"type": "text"},
-                "description": {"type": "text"},
-                "notes": {"type": "text"},
-                "status": {"type": "keyword"},
-                "manufacturer": {"type": "keyword"},
-                "serial": {"type": "keyword"},
-                "model": {"type": "keyword"},
-                "location": {"type": "keyword"},
-                "mount": {"type": "keyword"},
-                "hostname": {"type": "keyword"},
-                "dns": {"type": "keyword"},
-                "ip": {"type": "ip"},
-                "cpu_cores": {"type": "integer"},
-                "cpu_freq": {"type": "float"},
-                "ram": {"type": "integer"},
-                "total_volume": {"type": "integer"},
-                "type": {"type": "keyword"},
-                "category": {"type": "keyword"},
-                "user_org": {"type": "keyword"},
-                "owner_org": {"type": "keyword"},
-                "code_mon": {"type": "keyword"}
-            }
+def validate_dataframe(df: pd.DataFrame):
+    """Валидирует блок строк поколоночно.
+
+    Возвращает маску валидных строк и битовую маску ошибок по полям
+    (бит i установлен, если не прошло правило VALIDATION_RULES[i]).
+    """
+    error_bits = pd.Series(0, index=df.index, dtype='int64')
+    for bit, (field, regex, _) in enumerate(COMPILED_RULES):
+        if field in df.columns:
+            column = as_python_strings(df[field].fillna('').astype(str))
+        else:
+            column = pd.Series('', index=df.index, dtype=object)
+        failed = ~column.str.fullmatch(regex.pattern).fillna(False).astype(bool)
+        error_bits |= failed.astype('int64') * (1 << bit)
+    return error_bits == 0, error_bits
+
+def decode_validation_errors(error_bits: int) -> str:
+    """Преобразует битовую маску ошибок в текстовое описание"""
+    return "; ".join(
+        message for bit, (_, _, message) in enumerate(COMPILED_RULES)
+        if error_bits >> bit & 1
+    )
+
+def write_pipeline_csv(filename: str, frame: pd.DataFrame, header: bool):
+    """Дописывает блок конвейера в промежуточный CSV файл"""
+    frame.to_csv(os.path.join(CSV_FOLDER, filename), mode='w' if header else 'a', header=header,
+                 index=False, encoding='utf-8')
+
+def generate_external_dedup_actions(results: list, headers: list, counts: dict, write_csv: bool):
+    """Отдает действия для результатов дедупликации вне памяти"""
+    winners_paths = [part["winners_path"] for part in results]
+    losers_paths = [part["losers_path"] for part in results]
+    counts["valid_count"] = sum(part["valid_count"] for part in results)
+    counts["duplicate_count"] = sum(part["duplicate_count"] for part in results)
+
+    for row in iter_partition_rows(winners_paths):
+        doc = row_to_document(row, ELASTICSEARCH_INDEX)
+        if doc:
+            yield make_result_action(doc, row)
+    for row in iter_partition_rows(losers_paths):
+        doc = row_to_document(row, ELASTICSEARCH_INDEX)
+        if doc:
+            yield make_bulk_action(dict(doc, validation_errors=DUPLICATE_REASON), "deleted_db")
+
+    if write_csv:
+        with open(os.path.join(CSV_FOLDER, RESULT), 'w', encoding='utf-8', newline='') as result_file, \
+             open(os.path.join(CSV_FOLDER, DELETED), 'a', encoding='utf-8', newline='') as deleted_file:
+            csv.writer(result_file).writerow(headers)
+            for winners_path, losers_path in zip(winners_paths, losers_paths):
+                with open(winners_path, 'r', encoding='utf-8', newline='') as src:
+                    shutil.copyfileobj(src, result_file)
+                with open(losers_path, 'r', encoding='utf-8', newline='') as src:
+                    shutil.copyfileobj(src, deleted_file)
+
+def generate_pipeline_actions(stats: dict, counts: dict, write_csv: bool = PIPELINE_WRITE_CSV,
+                              dedup: bool = DEDUP_ENABLED, progress: dict = None):
+    """Один проход по загруженным CSV: валидация, дедупликация и маршрутизация в input_db, result_db и deleted_db"""
+    etalon_headers = get_etalon_headers()
+    best_rows = {}
+    header = True
+
+    external = dedup and DEDUP_EXTERNAL
+    if external:
+        # Валидные строки раскладываются по разделам и дедуплицируются после чтения всех файлов
+        input_size = sum(os.path.getsize(os.path.join(CSV_FOLDER, f)) for f in get_source_csv_files())
+        partitions = get_dedup_partitions(input_size)
+        spill_dir = tempfile.mkdtemp(dir=CSV_FOLDER)
+        spill_paths, spill_files, spill_writers = open_spill_files(spill_dir, partitions)
+
+    try:
+        for chunk in iter_merged_chunks(etalon_headers, progress=progress):
+            valid_mask, error_bits = validate_dataframe(chunk)
+            add_progress(progress, "rows_validated", len(chunk))
+            losers = []
+
+            if dedup and not external:
+                # Оценки и лучшие строки блока считаются поколоночно для валидных строк
+                rewards = np.zeros(len(chunk), dtype=np.int64)
+                chunk_winners = np.zeros(len(chunk), dtype=bool)
+                valid_positions = np.flatnonzero(valid_mask.to_numpy())
+                rewards[valid_positions], chunk_winners[valid_positions] = select_best_rows(chunk[valid_mask])
+                rewards = rewards.tolist()
+                chunk_winners = chunk_winners.tolist()
+
+            rows = chunk.itertuples(index=False, name=None)
+            typed_rows = [None] * len(chunk)
+            if CONVERT_COLUMNAR:
+                try:
+                    typed_rows = convert_typed_columns(chunk)
+                except Exception as convert_error:
+                    # Ошибка одной колонки не должна останавливать загрузку: блок приводится построчно
+                    print(f"Ошибка поколоночного приведения типов, блок обрабатывается построчно: {convert_error}")
+            for i, (row, typed, valid, bits) in enumerate(zip(rows, typed_rows, valid_mask.tolist(), error_bits.tolist())):
+                stats["rows"] += 1
+                try:
+                    doc = row_to_document(row, ELASTICSEARCH_INDEX, typed)
+                except Exception as doc_error:
+                    print(f"Ошибка в строке {stats['rows']}: {doc_error}")
+                    continue
+
+                if not doc:
+                    continue
+
+                # Документ строится один раз и используется для всех индексов
+                yield make_bulk_action(doc, ELASTICSEARCH_INDEX)
+                if not valid:
+                    counts["invalid_count"] += 1
+                    yield make_bulk_action(dict(doc, validation_errors=decode_validation_errors(bits)), "deleted_db")
+                elif external:
+                    spill_writers[partition_index(row, partitions)].writerow(row)
+                elif dedup:
+                    loser = dedup_offer(best_rows, row, rewards[i]) if chunk_winners[i] else row
+                    if loser is not None:
+                        losers.append(loser)
+                        counts["duplicate_count"] += 1
+                        loser_doc = doc if loser is row else row_to_document(loser, ELASTICSEARCH_INDEX)
+                        yield make_bulk_action(dict(loser_doc, validation_errors=DUPLICATE_REASON), "deleted_db")
+                else:
+                    counts["valid_count"] += 1
+                    yield make_result_action(doc, row)
+
+            if write_csv:
+                write_pipeline_csv(MERGED, chunk, header)
+                deleted = chunk[~valid_mask]
+                if losers:
+                    deleted = pd.concat([deleted, pd.DataFrame(losers, columns=etalon_headers)], ignore_index=True)
+                write_pipeline_csv(DELETED, deleted, header)
+                if not dedup:
+                    write_pipeline_csv(RESULT, chunk[valid_mask], header)
+                header = False
+
+        if external:
+            for f in spill_files:
+                f.close()
+            results = dedup_spilled(spill_paths, etalon_headers)
+            yield from generate_external_dedup_actions(results, etalon_headers, counts, write_csv)
+
+        elif dedup:
+            counts["valid_count"] = len(best_rows)
+            for row in iter_dedup_winners(best_rows):
+                doc = row_to_document(row, ELASTICSEARCH_INDEX)
+                if doc:
+                    yield make_result_action(doc, row)
+
+            if write_csv:
+                with open(os.path.join(CSV_FOLDER, RESULT), 'w', encoding='utf-8', newline='') as result_file:
+                    csv.writer(result_file).writerow(etalon_headers)
+                    write_dedup_winners(result_file, best_rows)
+
+    finally:
+        if external:
+            for f in spill_files:
+                f.close()
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+def run_pipeline(write_csv: bool = PIPELINE_WRITE_CSV, progress: dict = None, stats: dict = None) -> dict:
+    """Объединяет, валидирует и загружает данные во все индексы за одно чтение файлов"""
+    try:
+        if not get_source_csv_files():
+            return {"status": "error", "message": "Нет CSV файлов для обработки"}
+
+        create_elastic_index()
+        create_result_index()
+        create_deleted_index()
+
+        stats = stats if stats is not None else new_import_stats()
+        counts = {"valid_count": 0, "invalid_count": 0, "duplicate_count": 0}
+        actions = generate_pipeline_actions(stats, counts, write_csv, progress=progress)
+        index_names = f"{ELASTICSEARCH_INDEX},result_db,deleted_db"
+        if not index_actions(actions, stats, index_names):
+            for alias in index_names.split(","):
+                discard_index_build(alias)
+            return {"status": "error", "message": "Ошибка при импорте данных в Elasticsearch"}
+
+        for alias in index_names.split(","):
+            publish_index_build(alias)
+
+        return {
+            "status": "success",
+            "valid_count": counts["valid_count"],
+            "invalid_count": counts["invalid_count"],
+            "duplicate_count": counts["duplicate_count"]
         }
-    }
-    es.indices.create(index="result_db", body=mapping)
 
-def create_deleted_index():
-    """Создает индекс deleted_db в Elasticsearch для невалидных данных"""
-    if es.indices.exists(index="deleted_db"):
-        es.indices.delete(index="deleted_db")
-    
-    mapping = {
-        "mappings": {
-            "properties": {
-                "id": {"type": "integer"},
-                "created_on": {"type": "date"},
-                "updated_on": {"type": "date"},
-                "name": {"type": "text"},
-                "ci_code": {"type": "keyword"},
-                "short_name": {"type": "text"},
-                "full_name": {"type": "text"},
-                "description": {"type": "text"},
-                "notes": {"type": "text"},
-                "status": {"type": "keyword"},
-                "manufacturer": {"type": "keyword"},
-                "serial": {"type": "keyword"},
-                "model": {"type": "keyword"},
-                "location": {"type": "keyword"},
-                "mount": {"type": "keyword"},
-                "hostname": {"type": "keyword"},
-                "dns": {"type": "keyword"},
-                "ip": {"type": "ip"},
-                "cpu_cores": {"type": "integer"},
-                "cpu_freq": {"type": "float"},
-                "ram": {"type": "integer"},
-                "total_volume": {"type": "integer"},
-                "type": {"type": "keyword"},
-                "category": {"type": "keyword"},
-                "user_org": {"type": "keyword"},
-                "owner_org": {"type": "keyword"},
-                "code_mon": {"type": "keyword"},
-                "validation_errors": {"type": "text"}  # Дополнительное поле для ошибок валидации
-            }
+    except Exception as e:
+        for alias in (ELASTICSEARCH_INDEX, "result_db", "deleted_db"):
+            discard_index_build(alias)
+        return {
+            "status": "error",
+            "message": str(e)
         }
-    }
-    es.indices.create(index="deleted_db", body=mapping)
 
-def get_validation_errors(row: dict) -> str:
+def create_result_index():
+    """Создает новое поколение индекса result_db в Elasticsearch для валидных данных"""
+    mapping = build_mapping(CONTENT_HASH_PROPERTY)
+    if uses_stable_ids("result_db"):
+        # Поля ключа _id запоминаются в индексе: инкрементальная загрузка с другим ключом его не дополнит
+        mapping["mappings"]["_meta"] = {"document_key": INCREMENTAL_KEY_FIELDS}
+    return begin_index_build("result_db", mapping)
+
+def create_deleted_index():
+    """Создает новое поколение индекса deleted_db в Elasticsearch для невалидных данных"""
+    return begin_index_build("deleted_db", build_mapping(VALIDATION_ERRORS_PROPERTY))
+
+def get_validation_errors(row: tuple) -> str:
     """Возвращает строку с описанием ошибок валидации для невалидных записей"""
-    errors = []
-    
-    if not re.fullmatch(status_pattern, str(row.get(STATUS, ''))):
-        errors.append("Неверный формат статуса")
-    
-    if not re.fullmatch(ci_code_pattern, str(row.get(CI_CODE, ''))):
-        errors.append("Неверный формат CI кода")
-    
+    return "; ".join(
+        message for position, regex, message in ROW_RULES
+        if not regex.fullmatch(row[position])
+    )
+
+
+jobs = {}
+jobs_lock = threading.Lock()
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+
+def submit_job(kind: str, func) -> str:
+    """Ставит функцию func(job) в пул фоновых задач и возвращает id задачи"""
+    job = {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "status": "queued",
+        "message": None,
+        "created": time.time(),
+        "started": None,
+        "finished": None,
+        "rows_read": 0,
+        "rows_validated": 0,
+        "imports": []
+    }
+
+    def run():
+        job["status"] = "running"
+        job["started"] = time.time()
+        try:
+            job["message"] = func(job)
+            job["status"] = "done"
+        except Exception as e:
+            print(f"Ошибка фоновой задачи {job['id']} ({kind}): {str(e)}")
+            job["message"] = str(e)
+            job["status"] = "error"
+        finally:
+            job["finished"] = time.time()
+
+    with jobs_lock:
+        finished = [j for j in jobs.values() if j["finished"] is not None]
+        for old_job in sorted(finished, key=lambda j: j["finished"])[:max(0, len(finished) - JOB_HISTORY_LIMIT)]:
+            del jobs[old_job["id"]]
+        jobs[job["id"]] = job
+
+    job_executor.submit(run)
+    return job["id"]
+
+def job_import_stats(job: dict) -> dict:
+    """Создает счетчики импорта, видимые в прогрессе задачи"""
+    stats = new_import_stats()
+    job["imports"].append(stats)
+    return stats
+
+def job_snapshot(job: dict) -> dict:
+    """Состояние задачи для /jobs/{id}"""
+    docs_indexed = sum(stats["indexed"] for stats in job["imports"])
+    docs_failed = sum(stats["failed"] for stats in job["imports"])
+    docs_skipped = sum(stats["skipped"] for stats in job["imports"])
+    docs_deleted = sum(stats["deleted"] for stats in job["imports"])
+    elapsed = 0.0
+    if job["started"] is not None:
+        elapsed = (job["finished"] or time.time()) - job["started"]
+
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "message": job["message"],
+        "rows_read": job["rows_read"],
+        "rows_validated": job["rows_validated"],
+        "docs_indexed": docs_indexed,
+        "docs_failed": docs_failed,
+        "docs_skipped": docs_skipped,
+        "docs_deleted": docs_deleted,
+        "elapsed": round(elapsed, 1),
+        "rate": round(docs_indexed / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+def merge_job(job: dict) -> str:
+    """Фоновая задача: объединение файлов и загрузка в input_db"""
+    try:
+        merge_and_import(job)
+    except Exception:
+        discard_index_build(ELASTICSEARCH_INDEX)
+        raise
+    publish_index_build(ELASTICSEARCH_INDEX)
+
+    return "Файлы объединены и загружены в Elasticsearch"
+
+def merge_and_import(job: dict):
+    """Объединяет файлы и загружает их в новое поколение input_db"""
+    if MERGE_STREAM_TO_ES:
+        # Загружаем строки сразу в индекс, не создавая input.csv
+        if not get_source_csv_files():
+            raise Exception("Нет CSV файлов для объединения")
+        create_elastic_index()
+        if not index_rows(iter_merged_rows(progress=job), ELASTICSEARCH_INDEX, stats=job_import_stats(job)):
+            raise Exception("Ошибка при импорте данных в Elasticsearch")
+    else:
+        # Объединяем файлы
+        merged_file = merge_csv(progress=job)
+        if not merged_file:
+            raise Exception("Нет CSV файлов для объединения")
+
+        # Создаем индекс и импортируем данные
+        create_elastic_index()
+        if not import_to_elasticsearch(merged_file, ELASTICSEARCH_INDEX, stats=job_import_stats(job)):
+            raise Exception("Ошибка при импорте данных в Elasticsearch")
+
+def validate_job(job: dict) -> str:
+    """Фоновая задача: валидация input.csv и загрузка в result_db и deleted_db"""
+    input_path = get_staging_path(MERGED)
+    result_path = get_staging_path(RESULT)
+    deleted_path = get_staging_path(DELETED)
+
+    # Создаем новые поколения индексов перед валидацией;
+    # при инкрементальной загрузке result_db обновляется на месте
+    incremental = IMPORT_INCREMENTAL and incremental_ready("result_db")
+    if not incremental:
+        create_result_index()
+    create_deleted_index()
+
+    try:
+        validation_result = validate_csv(input_path, result_path, deleted_path, progress=job)
+        if validation_result["status"] != "success":
+            raise Exception(f"Ошибка валидации: {validation_result['message']}")
+
+        # Контрольные точки обоих импортов создаются заранее, чтобы продолжение загрузило оба индекса;
+        # при инкрементальной загрузке result_db обновляется на месте и контрольной точки не имеет
+        result_checkpoint = None
+        deleted_checkpoint = None
+        if IMPORT_CHECKPOINTS:
+            if not incremental:
+                result_checkpoint = new_checkpoint(result_path, "result_db")
+                save_checkpoint(result_checkpoint)
+            deleted_checkpoint = new_checkpoint(deleted_path, "deleted_db")
+            save_checkpoint(deleted_checkpoint)
+
+        # Импортируем валидные данные в result_db
+        if incremental:
+            imported = incremental_import(result_path, "result_db", stats=job_import_stats(job))
+        else:
+            imported = import_to_elasticsearch(result_path, index_name="result_db", stats=job_import_stats(job),
+                                               checkpoint=result_checkpoint)
+        if not imported:
+            raise Exception("Ошибка при импорте данных в result_db")
+
+        # Импортируем невалидные данные в deleted_db
+        if not import_to_elasticsearch(deleted_path, index_name="deleted_db", stats=job_import_stats(job),
+                                       checkpoint=deleted_checkpoint):
+            raise Exception("Ошибка при импорте данных в deleted_db")
+    except Exception:
+        discard_index_build("result_db")
+        discard_index_build("deleted_db")
+        raise
+
+    # Переключаем алиасы только после успешной загрузки обоих индексов
+    if not incremental:
+        publish_index_build("result_db")
+    publish_index_build("deleted_db")
+
+    return (f"Обработано записей: {validation_result['valid_count']} валидных, "
+            f"{validation_result['invalid_count']} невалидных, {validation_result['duplicate_count']} дубликатов")
+
+def resume_job(job: dict) -> str:
+    """Фоновая задача: продолжение прерванных загрузок"""
+    aliases = resume_imports(lambda: job_import_stats(job))
+    if not aliases:
+        raise Exception("Нет прерванных загрузок")
+    return f"Загрузка продолжена и завершена: {', '.join(aliases)}"
+
+def pipeline_job(job: dict) -> str:
+    """Фоновая задача: однопроходная обработка загруженных файлов"""
+    pipeline_result = run_pipeline(progress=job, stats=job_import_stats(job))
+    if pipeline_result["status"] != "success":
+        raise Exception(pipeline_result["message"])
+
+    return (f"Обработано записей: {pipeline_result['valid_count']} валидных, "
+            f"{pipeline_result['invalid_count']} невалидных, {pipeline_result['duplicate_count']} дубликатов")
 
 @app.post("/validate_csv")
 async def handle_validate_csv(request: Request):
     try:
-        input_path = os.path.join(CSV_FOLDER, MERGED)
-        result_path = os.path.join(CSV_FOLDER, RESULT)
-        deleted_path = os.path.join(CSV_FOLDER, DELETED)
+        input_path = get_staging_path(MERGED)
         
         if not os.path.exists(input_path):
             return templates.TemplateResponse(
                 "index.html",
                 {
                     "request": request,
-                    "error": "Файл input.csv не найден",
+                    "error": f"Файл {os.path.basename(input_path)} не найден",
                     "show_alert": True
                 }
             )
         
-        # Создаем индексы перед валидацией
-        create_result_index()
-        create_deleted_index()
-        
-        validation_result = validate_csv(input_path, result_path, deleted_path)
-        
-        if validation_result["status"] == "success":
-            # Импортируем валидные данные в result_db
-            import_to_elasticsearch(result_path, index_name="result_db")
-            
-            # Импортируем невалидные данные в deleted_db
-            import_to_elasticsearch(deleted_path, index_name="deleted_db")
-            
-            return templates.TemplateResponse(
-                "index.html",
-                {
-                    "request": request,
-                    "success": f"Обработано записей: {validation_result['valid_count']} валидных, {validation_result['invalid_count']} невалидных",
-                    "show_alert": True
-                }
-            )
-        else:
-            return templates.TemplateResponse(
-                "index.html",
-                {
-                    "request": request,
-                    "error": f"Ошибка валидации: {validation_result['message']}",
-                    "show_alert": True
-                }
-            )
+        job_id = submit_job("validate", validate_job)
+
+        return templates.TemplateResponse(
+            "index.html",
+            {
+                "request": request,
+                "success": f"Задача валидации запущена: {job_id}",
+                "show_alert": True,
+                "job_id": job_id
+            }
+        )
             
     except Exception as e:
         return templates.TemplateResponse(
@@ -558,11 +2160,12 @@ async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.get("/upload", response_class=HTMLResponse)
-async def read_upload(request: Request, success: str = None, error: str = None):
+async def read_upload(request: Request, success: str = None, error: str = None, job: str = None):
     return templates.TemplateResponse("upload.html", {
         "request": request,
         "success": success,
-        "error": error
+        "error": error,
+        "job_id": job
     })
 
 @app.post("/upload_files")
@@ -570,10 +2173,14 @@ async def upload_files(request: Request, files: list[UploadFile] = File(...)):
     try:
         uploaded_files = []
         for file in files:
-            file_path = os.path.join(CSV_FOLDER, file.filename)
-            with open(file_path, "wb") as buffer:
-                buffer.write(await file.read())
-            uploaded_files.append(file.filename)
+            filename = os.path.basename(file.filename)
+            file_path = os.path.join(CSV_FOLDER, filename)
+            # Пишем файл на диск частями по мере поступления, не держа его целиком в памяти
+            with open(file_path + ".part", "wb") as buffer:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    buffer.write(chunk)
+            os.replace(file_path + ".part", file_path)
+            uploaded_files.append(filename)
         
         return RedirectResponse(
             f"/upload?success=Файлы+{',+'.join(uploaded_files)}+успешно+загружены",
@@ -585,6 +2192,58 @@ async def upload_files(request: Request, files: list[UploadFile] = File(...)):
             status_code=303
         )
 
+@app.get("/upload_status/{filename}")
+async def upload_status(filename: str):
+    """Сколько байт файла уже получено, чтобы клиент продолжил загрузку с этого места"""
+    part_path = os.path.join(CSV_FOLDER, os.path.basename(filename) + ".part")
+    return {"received": os.path.getsize(part_path) if os.path.exists(part_path) else 0}
+
+@app.post("/upload_chunk")
+async def upload_chunk(
+    filename: str = Form(...),
+    offset: int = Form(...),  # Позиция части в файле
+    final: bool = Form(False),  # Последняя часть файла
+    chunk: UploadFile = File(...)
+):
+    """Принимает часть файла; загрузку можно продолжить после обрыва с позиции из /upload_status"""
+    filename = os.path.basename(filename)
+    part_path = os.path.join(CSV_FOLDER, filename + ".part")
+    received = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset > received:
+        return JSONResponse({"error": "Пропущена часть файла", "received": received}, status_code=409)
+
+    with open(part_path, "r+b" if received else "wb") as buffer:
+        buffer.seek(offset)
+        buffer.truncate()
+        while data := await chunk.read(UPLOAD_CHUNK_SIZE):
+            buffer.write(data)
+        received = buffer.tell()
+
+    if final:
+        os.replace(part_path, os.path.join(CSV_FOLDER, filename))
+    return {"received": received}
+
+@app.post("/resume_import")
+async def resume_import(request: Request):
+    try:
+        if not load_checkpoints():
+            return RedirectResponse(
+                "/upload?error=Нет+прерванных+загрузок",
+                status_code=303
+            )
+
+        job_id = submit_job("resume", resume_job)
+
+        return RedirectResponse(
+            f"/upload?success=Продолжение+загрузки+запущено&job={job_id}",
+            status_code=303
+        )
+    except Exception as e:
+        return RedirectResponse(
+            f"/upload?error=Ошибка:+{str(e).replace(' ', '+')}",
+            status_code=303
+        )
+
 @app.post("/merge_files")
 async def merge_files(request: Request):
     try:
@@ -592,21 +2251,16 @@ async def merge_files(request: Request):
         if not es.ping():
             raise ConnectionError("Не удалось подключиться к Elasticsearch")
         
-        # Объединяем файлы
-        merged_file = merge_csv()
-        if not merged_file:
+        if not get_source_csv_files():
             return RedirectResponse(
                 "/upload?error=Нет+CSV+файлов+для+объединения",
                 status_code=303
             )
-        
-        # Создаем индекс и импортируем данные
-        create_elastic_index()
-        if not import_to_elasticsearch(merged_file, ELASTICSEARCH_INDEX):
-            raise Exception("Ошибка при импорте данных в Elasticsearch")
+
+        job_id = submit_job("merge", merge_job)
         
         return RedirectResponse(
-            f"/upload?success=Файлы+объединены+и+загружены+в+Elasticsearch",
+            f"/upload?success=Задача+объединения+запущена&job={job_id}",
             status_code=303
         )
     except Exception as e:
@@ -615,238 +2269,314 @@ async def merge_files(request: Request):
             status_code=303
         )
 
-@app.get("/view_elasticsearch-original", response_class=HTMLResponse)
-async def view_elasticsearch(
-    request: Request,
-    query: Optional[str] = None,  # Полнотекстовый запрос
-    page: int = 1,  # Номер страницы
-    size: int = 50  # Количество документов на странице
-):
+@app.post("/process_files")
+async def process_files(request: Request):
     try:
-        # Расчет смещения (offset) для пагинации
-        from_ = (page - 1) * size
-
-        # Формируем запрос к Elasticsearch
-        if query:
-            search_query = {
-                "from": from_,
-                "size": size,
-                "query": {
-                    "multi_match": {
-                        "query": query,
-                        "fields": [
-                            "name",
-                            "ci_code",
-                            "short_name",
-                            "full_name",
-                            "description",
-                            "notes",
-                            "manufacturer",
-                            "serial",
-                            "model",
-                            "location",
-                            "mount",
-                            "hostname",
-                            "dns",
-                            "type",
-                            "category",
-                            "user_org",
-                            "owner_org",
-                            "code_mon"
-                        ]
-                    }
-                }
-            }
-        else:
-            search_query = {
-                "from": from_,
-                "size": size,
-                "query": {"match_all": {}}
-            }
-
-        # Выполняем поиск в индексе 'input_db'
-        response = es.search(index=ELASTICSEARCH_INDEX, body=search_query)
+        # Проверяем подключение к Elasticsearch
+        if not es.ping():
+            raise ConnectionError("Не удалось подключиться к Elasticsearch")
 
-        # Извлечение данных из ответа Elasticsearch
-        records = [
-            {
-                "_id": hit["_id"],  # ID документа в Elasticsearch
-                "id": hit["_source"].get("id", "N/A"),
-                "name": hit["_source"].get("name", "N/A"),
-                "ci_code": hit["_source"].get("ci_code", "N/A"),
-                "short_name": hit["_source"].get("short_name", "N/A"),
-                "full_name": hit["_source"].get("full_name", "N/A"),
-                "manufacturer": hit["_source"].get("manufacturer", "N/A"),
-                "serial": hit["_source"].get("serial", "N/A"),
-                "location": hit["_source"].get("location", "N/A"),
-                "mount": hit["_source"].get("mount", "N/A"),
-                "hostname": hit["_source"].get("hostname", "N/A"),
-                "dns": hit["_source"].get("dns", "N/A"),
-                "ip": hit["_source"].get("ip", "N/A"),
-                "type": hit["_source"].get("type", "N/A"),
-                "category": hit["_source"].get("category", "N/A"),
-                "user_org": hit["_source"].get("user_org", "N/A"),
-                "code_mon": hit["_source"].get("code_mon", "N/A")
-            }
-            for hit in response["hits"]["hits"]
-        ]
+        if not get_source_csv_files():
+            return RedirectResponse(
+                "/upload?error=Нет+CSV+файлов+для+обработки",
+                status_code=303
+            )
 
-        # Подготовка данных для пагинации
-        total_hits = response["hits"]["total"]["value"]  # Общее количество документов
-        total_pages = (total_hits + size - 1) // size  # Общее количество страниц
+        job_id = submit_job("pipeline", pipeline_job)
 
-        return templates.TemplateResponse(
-            "view_elasticsearch.html",
-            {
-                "request": request,
-                "records": records,
-                "page": page,
-                "size": size,
-                "total_pages": total_pages,
-                "total_hits": total_hits,
-                "query": query  # Передаем текущий запрос обратно в шаблон
-            }
+        return RedirectResponse(
+            f"/upload?success=Задача+обработки+запущена&job={job_id}",
+            status_code=303
         )
     except Exception as e:
-        error_message = f"Ошибка при получении данных из Elasticsearch: {str(e)}"
-        return templates.TemplateResponse(
-            "view_elasticsearch.html",
-            {"request": request, "error_message": error_message}
+        return RedirectResponse(
+            f"/upload?error=Ошибка:+{str(e).replace(' ', '+')}",
+            status_code=303
         )
 
-@app.post("/validate_csv")
-async def handle_validate_csv(request: Request):
+@app.get("/view_elasticsearch-{view}/record/{doc_id}", response_class=HTMLResponse)
+async def view_elasticsearch_record(request: Request, view: str, doc_id: str):
+    """Карточка записи с полным документом"""
+    context = {"request": request, "view": view, "doc_id": doc_id}
+    if view not in VIEW_INDICES:
+        context["error_message"] = "Неизвестный индекс"
+        return templates.TemplateResponse("view_record.html", context, status_code=404)
     try:
-        input_path = os.path.join(CSV_FOLDER, MERGED)
-        result_path = os.path.join(CSV_FOLDER, RESULT)
-        deleted_path = os.path.join(CSV_FOLDER, DELETED)
-        
-        if not os.path.exists(input_path):
-            return templates.TemplateResponse(
-                "index.html",
-                {
-                    "request": request,
-                    "error": "Файл input.csv не найден",
-                    "show_alert": True
-                }
-            )
-        
-        # Создаем индексы перед валидацией
-        create_result_index()
-        create_deleted_index()
-        
-        validation_result = validate_csv(input_path, result_path, deleted_path)
-        
-        if validation_result["status"] == "success":
-            # Импортируем валидные данные в result_db
-            import_to_elasticsearch(result_path, index_name="result_db")
-            
-            # Импортируем невалидные данные в deleted_db
-            import_to_elasticsearch(deleted_path, index_name="deleted_db")
-            
-            return templates.TemplateResponse(
-                "index.html",
-                {
-                    "request": request,
-                    "success": f"Обработано записей: {validation_result['valid_count']} валидных, {validation_result['invalid_count']} невалидных",
-                    "show_alert": True
-                }
-            )
-        else:
-            return templates.TemplateResponse(
-                "index.html",
-                {
-                    "request": request,
-                    "error": f"Ошибка валидации: {validation_result['message']}",
-                    "show_alert": True
-                }
-            )
-            
+        response = await es_async.get(index=VIEW_INDICES[view], id=doc_id)
+    except NotFoundError:
+        context["error_message"] = "Запись не найдена"
+        return templates.TemplateResponse("view_record.html", context, status_code=404)
     except Exception as e:
-        return templates.TemplateResponse(
-            "index.html",
-            {
-                "request": request,
-                "error": f"Ошибка: {str(e)}",
-                "show_alert": True
-            }
-        )
+        context["error_message"] = f"Ошибка при получении данных из Elasticsearch: {str(e)}"
+        return templates.TemplateResponse("view_record.html", context)
 
-@app.get("/view_elasticsearch-result", response_class=HTMLResponse)
-async def view_elasticsearch_result(
-    request: Request,
-    query: Optional[str] = None,  # Полнотекстовый запрос
-    page: int = 1,  # Номер страницы
-    size: int = 50  # Количество документов на странице
-):
+    context["document"] = response["_source"]
+    return templates.TemplateResponse("view_record.html", context)
+
+@app.get("/search_cache")
+async def search_cache_status():
+    """Счетчики кэша поиска"""
+    with search_cache_lock:
+        return dict(search_cache_stats, entries=len(search_cache), bytes=search_cache_bytes,
+                    timings={index: dict(timing) for index, timing in search_timings.items()})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Задача не найдена"}, status_code=404)
+    return job_snapshot(job)
+
+search_pits = {}  # Индекс -> открытый point-in-time и курсоры его страниц
+search_pit_generation = 0
+
+def encode_cursor(generation: int, page: int, search_after: list) -> str:
+    """Упаковывает курсор страницы для ссылки"""
+    data = json.dumps({"g": generation, "p": page, "a": search_after}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[dict]:
+    """Распаковывает курсор из ссылки; поврежденный курсор игнорируется"""
+    if not cursor:
+        return None
     try:
-        # Расчет смещения (offset) для пагинации
-        from_ = (page - 1) * size
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except Exception:
+        return None
 
-        # Формируем запрос к Elasticsearch
-        if query:
-            search_query = {
-                "from": from_,
-                "size": size,
-                "query": {
-                    "multi_match": {
-                        "query": query,
-                        "fields": [
-                            "name",
-                            "ci_code",
-                            "short_name",
-                            "full_name",
-                            "description",
-                            "notes",
-                            "manufacturer",
-                            "serial",
-                            "model",
-                            "location",
-                            "mount",
-                            "hostname",
-                            "dns",
-                            "type",
-                            "category",
-                            "user_org",
-                            "owner_org",
-                            "code_mon"
-                        ]
-                    }
-                }
-            }
-        else:
-            search_query = {
-                "from": from_,
-                "size": size,
-                "query": {"match_all": {}}
-            }
+def search_sort(query: dict) -> list:
+    """Стабильная сортировка для search_after: релевантность и порядок документа в шарде"""
+    if "match_all" in query or ("bool" in query and "must" not in query["bool"]):
+        return [{"_shard_doc": "asc"}]
+    return [{"_score": "desc"}, {"_shard_doc": "asc"}]
 
-        # Выполняем поиск в индексе 'result_db'
-        response = es.search(index="result_db", body=search_query)
+async def get_search_pit(index_name: str) -> dict:
+    """Возвращает открытый point-in-time индекса, открывая новый при необходимости"""
+    global search_pit_generation
+    state = search_pits.get(index_name)
+    if state is None:
+        response = await es_async.open_point_in_time(index=index_name, keep_alive=SEARCH_PIT_KEEP_ALIVE)
+        search_pit_generation += 1
+        state = {"id": response["id"], "generation": search_pit_generation, "cursors": OrderedDict()}
+        search_pits[index_name] = state
+    return state
 
-        # Извлечение данных из ответа Elasticsearch
-        records = [
-            {
-                "_id": hit["_id"],  # ID документа в Elasticsearch
-                "id": hit["_source"].get("id", "N/A"),
-                "name": hit["_source"].get("name", "N/A"),
-                "ci_code": hit["_source"].get("ci_code", "N/A"),
-                "short_name": hit["_source"].get("short_name", "N/A"),
-                "full_name": hit["_source"].get("full_name", "N/A"),
-                "manufacturer": hit["_source"].get("manufacturer", "N/A"),
-                "serial": hit["_source"].get("serial", "N/A"),
-                "location": hit["_source"].get("location", "N/A"),
-                "mount": hit["_source"].get("mount", "N/A"),
-                "hostname": hit["_source"].get("hostname", "N/A"),
-                "dns": hit["_source"].get("dns", "N/A"),
-                "ip": hit["_source"].get("ip", "N/A"),
-                "type": hit["_source"].get("type", "N/A"),
-                "category": hit["_source"].get("category", "N/A"),
-                "user_org": hit["_source"].get("user_org", "N/A"),
-                "code_mon": hit["_source"].get("code_mon", "N/A")
-            }
-            for hit in response["hits"]["hits"]
+def remember_cursor(state: dict, key: tuple, search_after: list):
+    """Сохраняет курсор страницы в ограниченном кэше"""
+    state["cursors"][key] = search_after
+    state["cursors"].move_to_end(key)
+    while len(state["cursors"]) > SEARCH_CURSOR_CACHE_SIZE:
+        state["cursors"].popitem(last=False)
+
+async def pit_search(state: dict, body: dict) -> dict:
+    """Выполняет поиск в point-in-time и обновляет его id"""
+    body = dict(body, pit={"id": state["id"], "keep_alive": SEARCH_PIT_KEEP_ALIVE})
+    response = await es_async.search(body=body)
+    state["id"] = response.get("pit_id", state["id"])
+    return response
+
+async def find_search_after(state: dict, query: dict, query_key: str, page: int, size: int,
+                            post_filter: Optional[dict] = None):
+    """Находит search_after для страницы по ближайшему сохраненному курсору"""
+    if page <= 1:
+        return None
+
+    start_page, search_after = 1, None
+    for cached_page in range(page, 1, -1):
+        cached = state["cursors"].get((query_key, size, cached_page))
+        if cached is not None:
+            start_page, search_after = cached_page, cached
+            break
+
+    # Пропускаем документы до нужной страницы, запрашивая только значения сортировки
+    remaining = (page - start_page) * size
+    while remaining > 0:
+        step = min(remaining, SEARCH_MAX_WINDOW)
+        body = {"size": step, "query": query, "sort": search_sort(query), "_source": False,
+                "track_total_hits": False}
+        if post_filter is not None:
+            body["post_filter"] = post_filter
+        if search_after is not None:
+            body["search_after"] = search_after
+        hits = (await pit_search(state, body))["hits"]["hits"]
+        if not hits:
+            break
+        search_after = hits[-1]["sort"]
+        remaining -= len(hits)
+        if len(hits) < step:
+            break
+
+    remember_cursor(state, (query_key, size, page), search_after)
+    return search_after
+
+async def search_page(index_name: str, query: dict, page: int, size: int, cursor: Optional[str] = None,
+                      aggregations: Optional[dict] = None, post_filter: Optional[dict] = None):
+    """Возвращает страницу результатов через point-in-time и search_after и курсор следующей страницы.
+    post_filter отбирает документы страницы, но не влияет на агрегации"""
+    query_key = json.dumps(query, sort_keys=True)
+    cache_key = None
+    if aggregations:
+        query_key += json.dumps(aggregations, sort_keys=True)
+    if post_filter is not None:
+        query_key += json.dumps(post_filter, sort_keys=True)
+    if SEARCH_CACHE_ENABLED:
+        cache_key = (index_name, index_generations.get(index_name, 0), query_key, page, size)
+        cached = get_cached_search(cache_key)
+        if cached is not None:
+            return cached
+
+    for attempt in range(2):
+        state = await get_search_pit(index_name)
+        try:
+            decoded = decode_cursor(cursor)
+            if decoded and decoded.get("g") == state["generation"] and decoded.get("p") == page:
+                search_after = decoded.get("a")
+            else:
+                search_after = await find_search_after(state, query, query_key, page, size, post_filter)
+
+            body = listing_body(query, size)
+            body["sort"] = search_sort(query)
+            if aggregations:
+                body["aggs"] = aggregations
+            if post_filter is not None:
+                body["post_filter"] = post_filter
+            if search_after is not None:
+                body["search_after"] = search_after
+            started = time.perf_counter()
+            response = await pit_search(state, body)
+            record_search_timing(index_name, started)
+
+            next_cursor = None
+            hits = response["hits"]["hits"]
+            if len(hits) == size:
+                next_after = hits[-1]["sort"]
+                remember_cursor(state, (query_key, size, page + 1), next_after)
+                next_cursor = encode_cursor(state["generation"], page + 1, next_after)
+            if cache_key is not None:
+                put_cached_search(cache_key, (response, next_cursor))
+            return response, next_cursor
+
+        except NotFoundError:
+            # Point-in-time истек или индекс был пересоздан: открываем новый
+            search_pits.pop(index_name, None)
+            if attempt:
+                raise
+
+def listing_record(hit: dict) -> dict:
+    """Собирает строку таблицы из отфильтрованного _source и doc values"""
+    source = hit.get("_source", {})
+    fields = hit.get("fields", {})
+    record = {"_id": hit["_id"]}
+    for field in LISTING_SOURCE_FIELDS:
+        record[field] = source.get(field, "N/A")
+    for field in LISTING_DOCVALUE_FIELDS:
+        values = fields.get(field)
+        record[field] = values[0] if values else "N/A"
+    return record
+
+def build_search_query(query: Optional[str], filters: Optional[dict] = None) -> dict:
+    """Полнотекстовый поиск по полям SEARCH_FIELDS или все документы, если запрос пустой,
+    с фильтрами по значениям фасетов"""
+    if query:
+        clause = {"multi_match": {"query": query, "fields": SEARCH_FIELDS}}
+    else:
+        clause = {"match_all": {}}
+    if not filters:
+        return clause
+
+    filter_clauses = facet_filter_clauses(filters)
+    if query:
+        return {"bool": {"must": [clause], "filter": filter_clauses}}
+    return {"bool": {"filter": filter_clauses}}
+
+def facet_filter_clauses(filters: dict, exclude: Optional[str] = None) -> list:
+    """Условия terms по выбранным значениям фасетов, кроме поля exclude"""
+    return [{"terms": {field: sorted(values)}} for field, values in sorted(filters.items()) if field != exclude]
+
+def facet_post_filter(filters: dict) -> Optional[dict]:
+    """Фильтр документов страницы по фасетам. Он применяется после агрегаций,
+    поэтому у выбранного поля остаются видны и другие значения"""
+    if not filters:
+        return None
+    return {"bool": {"filter": facet_filter_clauses(filters)}}
+
+def get_facet_filters(request: Request) -> dict:
+    """Выбранные значения фасетов из параметров запроса"""
+    filters = {}
+    for field in FACET_FIELDS:
+        values = [value for value in request.query_params.getlist(field) if value]
+        if values:
+            filters[field] = values
+    return filters
+
+def facet_aggregations(filters: Optional[dict] = None) -> dict:
+    """Terms-агрегации по полям фасетов. Значения каждого поля считаются с учетом
+    выбранных значений остальных полей, но не своих"""
+    aggregations = {}
+    for field in FACET_FIELDS:
+        other_clauses = facet_filter_clauses(filters or {}, exclude=field)
+        aggregations[field] = {
+            "filter": {"bool": {"filter": other_clauses}} if other_clauses else {"match_all": {}},
+            "aggs": {"values": {"terms": {"field": field, "size": FACET_SIZE}}}
+        }
+    return aggregations
+
+def get_facets(response: dict, filters: dict) -> list:
+    """Значения фасетов с количеством документов и отметкой выбранных"""
+    facets = []
+    aggregations = response.get("aggregations", {})
+    for field in FACET_FIELDS:
+        selected = set(filters.get(field, []))
+        buckets = [
+            {"value": bucket["key"], "count": bucket["doc_count"], "selected": bucket["key"] in selected}
+            for bucket in aggregations.get(field, {}).get("values", {}).get("buckets", [])
         ]
+        # Выбранные значения показываем, даже если они не попали в топ
+        shown = {bucket["value"] for bucket in buckets}
+        buckets += [{"value": value, "count": 0, "selected": True} for value in sorted(selected - shown)]
+        if buckets:
+            facets.append({"field": field, "buckets": buckets})
+    return facets
+
+def listing_body(query: dict, size: int) -> dict:
+    """Тело поиска с проекцией на поля таблицы просмотра"""
+    return {"size": size, "query": query, "track_total_hits": True,
+            "_source": LISTING_SOURCE_FIELDS, "docvalue_fields": LISTING_DOCVALUE_FIELDS}
+
+def record_search_timing(index_name: str, started: float):
+    """Учитывает время поиска по индексу"""
+    with search_cache_lock:
+        timing = search_timings.setdefault(index_name, {"searches": 0, "seconds": 0.0})
+        timing["searches"] += 1
+        timing["seconds"] += time.perf_counter() - started
+
+async def msearch_first_pages(index_names: list, query: dict, size: int) -> list:
+    """Возвращает первые страницы нескольких индексов за один запрос _msearch"""
+    body = []
+    for index_name in index_names:
+        body.append({"index": index_name})
+        body.append(listing_body(query, size))
+
+    started = time.perf_counter()
+    response = await es_async.msearch(body=body)
+    record_search_timing("_msearch", started)
+    return response["responses"]
+
+async def render_search_view(request: Request, view: str, query: Optional[str], page: int, size: int,
+                             cursor: Optional[str]):
+    """Страница просмотра индекса: поиск, проекция полей и пагинация"""
+    try:
+        page = max(page, 1)
+        filters = get_facet_filters(request)
+        # Фасеты фильтруют документы через post_filter, а не в запросе: иначе агрегации видели бы
+        # только уже отобранные документы и второе значение того же поля нельзя было бы выбрать
+        response, next_cursor = await search_page(
+            VIEW_INDICES[view], build_search_query(query), page, size, cursor, facet_aggregations(filters),
+            facet_post_filter(filters)
+        )
+
+        # Извлечение данных из ответа Elasticsearch
+        records = [listing_record(hit) for hit in response["hits"]["hits"]]
 
         # Подготовка данных для пагинации
         total_hits = response["hits"]["total"]["value"]  # Общее количество документов
@@ -861,118 +2591,163 @@ async def view_elasticsearch_result(
                 "size": size,
                 "total_pages": total_pages,
                 "total_hits": total_hits,
-                "query": query  # Передаем текущий запрос обратно в шаблон
+                "query": query,  # Передаем текущий запрос обратно в шаблон
+                "next_cursor": next_cursor,
+                "view": view,
+                "facets": get_facets(response, filters),
+                "filters": filters,
+                # Выбранные фильтры для ссылок пагинации
+                "filter_query": urllib.parse.urlencode([(field, value) for field, values in filters.items() for value in values])
             }
         )
     except Exception as e:
         error_message = f"Ошибка при получении данных из Elasticsearch: {str(e)}"
         return templates.TemplateResponse(
             "view_elasticsearch.html",
-            {"request": request, "error_message": error_message}
+            {"request": request, "error_message": error_message, "view": view}
         )
 
+async def iter_index_documents(index_name: str, query: dict, batch_size: int = EXPORT_BATCH_SIZE):
+    """Перебирает документы индекса пачками через отдельный point-in-time и search_after"""
+    pit = await es_async.open_point_in_time(index=index_name, keep_alive=SEARCH_PIT_KEEP_ALIVE)
+    pit_id = pit["id"]
+    search_after = None
+    try:
+        while True:
+            body = {
+                "size": batch_size,
+                "query": query,
+                "sort": [{"_shard_doc": "asc"}],
+                "track_total_hits": False,
+                "pit": {"id": pit_id, "keep_alive": SEARCH_PIT_KEEP_ALIVE}
+            }
+            if search_after is not None:
+                body["search_after"] = search_after
+            response = await es_async.search(body=body)
+            pit_id = response.get("pit_id", pit_id)
+            hits = response["hits"]["hits"]
+            if not hits:
+                break
+            yield hits
+            if len(hits) < batch_size:
+                break
+            search_after = hits[-1]["sort"]
+    finally:
+        # При обрыве соединения Starlette отменяет выгрузку; без защиты от отмены
+        # закрытие тоже отменилось бы и point-in-time остался открытым до истечения keep_alive
+        with anyio.CancelScope(shield=True):
+            await close_search_pit(pit_id)
 
+async def stream_csv_export(index_name: str, query: dict, fields: list):
+    """Выгрузка в CSV: заголовок отдается сразу, затем по пачке строк на запрос к Elasticsearch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue().encode('utf-8')
 
-@app.get("/view_elasticsearch-delete", response_class=HTMLResponse)
-async def view_elasticsearch_delete(
+    async for hits in iter_index_documents(index_name, query):
+        buffer.seek(0)
+        buffer.truncate()
+        for hit in hits:
+            source = hit["_source"]
+            writer.writerow(["" if source.get(field) is None else source.get(field) for field in fields])
+        yield buffer.getvalue().encode('utf-8')
+
+async def stream_ndjson_export(index_name: str, query: dict):
+    """Выгрузка в NDJSON: по одному документу на строку"""
+    async for hits in iter_index_documents(index_name, query):
+        yield "".join(json.dumps(hit["_source"], ensure_ascii=False) + "\n" for hit in hits).encode('utf-8')
+
+@app.get("/export/{view}")
+async def export_index(
     request: Request,
-    query: Optional[str] = None,  # Полнотекстовый запрос
-    page: int = 1,  # Номер страницы
-    size: int = 50  # Количество документов на странице
+    view: str,
+    format: str = "csv",  # csv или ndjson
+    query: Optional[str] = None  # Полнотекстовый запрос, фильтры фасетов передаются как на странице просмотра
 ):
-    try:
-        # Расчет смещения (offset) для пагинации
-        from_ = (page - 1) * size
-
-        # Формируем запрос к Elasticsearch
-        if query:
-            search_query = {
-                "from": from_,
-                "size": size,
-                "query": {
-                    "multi_match": {
-                        "query": query,
-                        "fields": [
-                            "name",
-                            "ci_code",
-                            "short_name",
-                            "full_name",
-                            "description",
-                            "notes",
-                            "manufacturer",
-                            "serial",
-                            "model",
-                            "location",
-                            "mount",
-                            "hostname",
-                            "dns",
-                            "type",
-                            "category",
-                            "user_org",
-                            "owner_org",
-                            "code_mon"
-                        ]
-                    }
-                }
-            }
-        else:
-            search_query = {
-                "from": from_,
-                "size": size,
-                "query": {"match_all": {}}
-            }
+    """Потоковая выгрузка индекса или результатов поиска"""
+    if view not in VIEW_INDICES:
+        return JSONResponse({"error": "Неизвестный индекс"}, status_code=404)
 
-        # Выполняем поиск в индексе 'deleted_db'
-        response = es.search(index="deleted_db", body=search_query)
+    index_name = VIEW_INDICES[view]
+    search_query = build_search_query(query, get_facet_filters(request))
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_ndjson_export(index_name, search_query),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{index_name}.ndjson"'}
+        )
+    if format == "csv":
+        fields = EXPORT_FIELDS + (["validation_errors"] if index_name == "deleted_db" else [])
+        return StreamingResponse(
+            stream_csv_export(index_name, search_query, fields),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{index_name}.csv"'}
+        )
+    return JSONResponse({"error": "Неизвестный формат выгрузки"}, status_code=400)
 
-        # Извлечение данных из ответа Elasticsearch
-        records = [
-            {
-                "_id": hit["_id"],  # ID документа в Elasticsearch
-                "id": hit["_source"].get("id", "N/A"),
-                "name": hit["_source"].get("name", "N/A"),
-                "ci_code": hit["_source"].get("ci_code", "N/A"),
-                "short_name": hit["_source"].get("short_name", "N/A"),
-                "full_name": hit["_source"].get("full_name", "N/A"),
-                "manufacturer": hit["_source"].get("manufacturer", "N/A"),
-                "serial": hit["_source"].get("serial", "N/A"),
-                "location": hit["_source"].get("location", "N/A"),
-                "mount": hit["_source"].get("mount", "N/A"),
-                "hostname": hit["_source"].get("hostname", "N/A"),
-                "dns": hit["_source"].get("dns", "N/A"),
-                "ip": hit["_source"].get("ip", "N/A"),
-                "type": hit["_source"].get("type", "N/A"),
-                "category": hit["_source"].get("category", "N/A"),
-                "user_org": hit["_source"].get("user_org", "N/A"),
-                "code_mon": hit["_source"].get("code_mon", "N/A")
-            }
-            for hit in response["hits"]["hits"]
-        ]
+@app.get("/view_elasticsearch-all", response_class=HTMLResponse)
+async def view_elasticsearch_all(
+    request: Request,
+    query: Optional[str] = None,  # Полнотекстовый запрос
+    size: int = 20  # Количество документов каждого индекса
+):
+    """Поиск сразу по исходным, валидным и удаленным записям одним запросом _msearch"""
+    try:
+        views = list(VIEW_INDICES)
+        responses = await msearch_first_pages([VIEW_INDICES[view] for view in views], build_search_query(query), size)
 
-        # Подготовка данных для пагинации
-        total_hits = response["hits"]["total"]["value"]  # Общее количество документов
-        total_pages = (total_hits + size - 1) // size  # Общее количество страниц
+        sections = []
+        for view, response in zip(views, responses):
+            if "error" in response:
+                sections.append({"view": view, "records": [], "total_hits": 0, "error_message": str(response["error"])})
+                continue
+            sections.append({
+                "view": view,
+                "records": [listing_record(hit) for hit in response["hits"]["hits"]],
+                "total_hits": response["hits"]["total"]["value"]
+            })
 
         return templates.TemplateResponse(
-            "view_elasticsearch.html",
-            {
-                "request": request,
-                "records": records,
-                "page": page,
-                "size": size,
-                "total_pages": total_pages,
-                "total_hits": total_hits,
-                "query": query  # Передаем текущий запрос обратно в шаблон
-            }
+            "view_elasticsearch_all.html",
+            {"request": request, "sections": sections, "query": query, "size": size}
         )
     except Exception as e:
         error_message = f"Ошибка при получении данных из Elasticsearch: {str(e)}"
         return templates.TemplateResponse(
-            "view_elasticsearch.html",
-            {"request": request, "error_message": error_message}
+            "view_elasticsearch_all.html",
+            {"request": request, "error_message": error_message, "query": query}
         )
 
+@app.get("/view_elasticsearch-original", response_class=HTMLResponse)
+async def view_elasticsearch(
+    request: Request,
+    query: Optional[str] = None,  # Полнотекстовый запрос
+    page: int = 1,  # Номер страницы
+    size: int = 50,  # Количество документов на странице
+    cursor: Optional[str] = None  # Курсор search_after для запрошенной страницы
+):
+    return await render_search_view(request, "original", query, page, size, cursor)
+
+@app.get("/view_elasticsearch-result", response_class=HTMLResponse)
+async def view_elasticsearch_result(
+    request: Request,
+    query: Optional[str] = None,  # Полнотекстовый запрос
+    page: int = 1,  # Номер страницы
+    size: int = 50,  # Количество документов на странице
+    cursor: Optional[str] = None  # Курсор search_after для запрошенной страницы
+):
+    return await render_search_view(request, "result", query, page, size, cursor)
 
+@app.get("/view_elasticsearch-delete", response_class=HTMLResponse)
+async def view_elasticsearch_delete(
+    request: Request,
+    query: Optional[str] = None,  # Полнотекстовый запрос
+    page: int = 1,  # Номер страницы
+    size: int = 50,  # Количество документов на странице
+    cursor: Optional[str] = None  # Курсор search_after для запрошенной страницы
+):
+    return await render_search_view(request, "delete", query, page, size, cursor)
 
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file